@@ -1,12 +1,34 @@
-from .resume_analysis_agent import analyze_resume, analyze_resume_from_files
-from .hr_conversational_agent import HRConversationalAgent, create_hr_agent
-from .email_writing_agent import generate_email_with_ai
+import importlib
+
+# Public name -> defining submodule. Submodules are imported on first
+# attribute access (PEP 562) so `import agents` does not load LangChain.
+_LAZY_EXPORTS = {
+    'analyze_resume': '.resume_analysis_agent',
+    'analyze_resume_from_files': '.resume_analysis_agent',
+    'HRConversationalAgent': '.hr_conversational_agent',
+    'create_hr_agent': '.hr_conversational_agent',
+    'bulk_process': '.hr_conversational_agent',
+    'generate_email_with_ai': '.email_writing_agent',
+}
 
 __all__ = [
     'analyze_resume', 
     'analyze_resume_from_files',
     'HRConversationalAgent',
     'create_hr_agent',
+    'bulk_process',
     'generate_email_with_ai'
 ]
 
+
+def __getattr__(name):
+    module_name = _LAZY_EXPORTS.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(module_name, __name__), name)
+    globals()[name] = value  # later lookups skip __getattr__
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -0,0 +1,20 @@
+"""
+Process-wide LLM response cache.
+Importing this module installs a persistent exact-match cache for every
+LangChain model invocation, so identical prompts (same model, same
+parameters) are answered from disk instead of another API round-trip.
+"""
+from config import LLM_CACHE_PATH
+from utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    from langchain_core.globals import set_llm_cache
+    from langchain_community.cache import SQLiteCache
+    set_llm_cache(SQLiteCache(database_path=LLM_CACHE_PATH))
+    LLM_CACHE_ENABLED = True
+    logger.debug("LLM response cache enabled at %s", LLM_CACHE_PATH)
+except Exception as e:
+    LLM_CACHE_ENABLED = False
+    logger.warning("LLM response cache unavailable: %s", e)
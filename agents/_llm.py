@@ -0,0 +1,211 @@
+"""
+Shared LLM client construction for the agents.
+Clients are memoized per temperature so every agent reuses the same
+model object (and its underlying HTTP connection pool).
+"""
+import importlib.util
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Optional
+from config import GEMINI_API_KEY, DEEPSEEK_API_KEY, GEMINI_CONTEXT_CACHE_TTL
+from utils.logger import get_logger, sanitize_error_message
+from agents import _cache  # installs the global LLM response cache
+
+logger = get_logger(__name__)
+
+# Only probe for the providers here; the heavy imports happen once, inside
+# the lru_cached _get_chat_model, on first use
+GEMINI_AVAILABLE = importlib.util.find_spec("langchain_google_genai") is not None
+if not GEMINI_AVAILABLE:
+    logger.warning("langchain-google-genai not installed. Gemini support unavailable.")
+OPENAI_AVAILABLE = importlib.util.find_spec("langchain_openai") is not None
+if not OPENAI_AVAILABLE:
+    logger.warning("langchain-openai not installed. DeepSeek support unavailable.")
+
+GEMINI_MODEL = "models/gemini-2.5-flash"
+DEEPSEEK_MODEL = "deepseek-chat"
+
+
+def _transient_errors() -> tuple:
+    """Exception types worth retrying: timeouts, dropped connections, 429/5xx."""
+    errors = [TimeoutError, ConnectionError]
+    try:
+        import httpx
+        errors.append(httpx.TransportError)
+    except ImportError:
+        pass
+    try:
+        import openai
+        errors.extend([openai.RateLimitError, openai.APITimeoutError,
+                       openai.APIConnectionError, openai.InternalServerError])
+    except (ImportError, AttributeError):
+        pass
+    try:
+        from google.api_core import exceptions as google_exceptions
+        errors.extend([google_exceptions.ResourceExhausted, google_exceptions.ServiceUnavailable,
+                       google_exceptions.DeadlineExceeded, google_exceptions.InternalServerError])
+    except ImportError:
+        pass
+    return tuple(errors)
+
+
+_TRANSIENT_ERRORS = _transient_errors()
+
+
+def _with_retry(model):
+    """Retry transient provider errors with exponential backoff (3 attempts)."""
+    return model.with_retry(
+        retry_if_exception_type=_TRANSIENT_ERRORS,
+        wait_exponential_jitter=True,
+        stop_after_attempt=3
+    )
+
+
+def _cache_kwargs(cache: bool) -> dict:
+    """Model kwargs opting out of the global response cache when requested."""
+    return {} if cache or not _cache.LLM_CACHE_ENABLED else {"cache": False}
+
+
+@lru_cache(maxsize=8)
+def _get_chat_model(provider: str, model_name: str, temperature: float, cache: bool = True):
+    """
+    Build (once per provider/model/temperature) a chat model client.
+
+    The client owns its HTTP connection pool, so reusing the instance also
+    reuses keep-alive connections across calls.
+    """
+    if provider == "gemini":
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        # Use environment variable instead of passing key directly
+        # This prevents API key exposure in error messages
+        return ChatGoogleGenerativeAI(
+            model=model_name,
+            temperature=temperature,
+            **_cache_kwargs(cache)
+        )
+    if provider == "deepseek":
+        from langchain_openai import ChatOpenAI
+        # A fixed seed makes temperature-0 calls reproducible on DeepSeek too.
+        # Other temperatures stay unseeded, but that alone does not vary repeated
+        # drafts: identical prompts are answered by the response cache unless
+        # the caller passes cache=False (the app does so to regenerate a draft)
+        seed_kwargs = {"seed": 0} if temperature == 0 else {}
+        return ChatOpenAI(
+            base_url="https://api.deepseek.com/v1",
+            model=model_name,
+            temperature=temperature,
+            openai_api_key=DEEPSEEK_API_KEY,
+            **seed_kwargs,
+            **_cache_kwargs(cache)
+        )
+    raise ValueError(f"Unknown LLM provider: {provider}")
+
+
+@lru_cache(maxsize=8)
+def get_llm_model(temperature: float = 0.7, cache: bool = True):
+    """
+    Get an available LLM model (Gemini or DeepSeek).
+    Prefers Gemini if both are available, failing over to DeepSeek when
+    Gemini keeps erroring; transient errors are retried with backoff first.
+    The result is cached per temperature, so repeated calls return the
+    same client instance.
+
+    Args:
+        temperature: Sampling temperature for the model
+        cache: Whether responses go through the global LLM response cache
+
+    Returns:
+        LLM runnable (supports invoke/ainvoke/batch/stream like a chat model)
+
+    Raises:
+        ValueError: If no API keys are available
+    """
+    providers = []
+    if GEMINI_AVAILABLE and GEMINI_API_KEY:
+        providers.append(("gemini", GEMINI_MODEL))
+    if OPENAI_AVAILABLE and DEEPSEEK_API_KEY:
+        providers.append(("deepseek", DEEPSEEK_MODEL))
+
+    # Build the providers concurrently so a slow client import/init does not
+    # delay the other one; Gemini is still preferred as the primary model.
+    models = []
+    with ThreadPoolExecutor(max_workers=max(len(providers), 1)) as executor:
+        futures = [
+            (model_name, executor.submit(_get_chat_model, provider, model_name, temperature, cache))
+            for provider, model_name in providers
+        ]
+        for model_name, future in futures:
+            try:
+                models.append(future.result())
+                logger.info("%s available (temperature=%s)", model_name, temperature)
+            except Exception as e:
+                # Sanitize error message to prevent API key exposure
+                # (skipped entirely when warnings are not being logged)
+                if logger.isEnabledFor(logging.WARNING):
+                    logger.warning("Failed to initialize %s: %s", model_name, sanitize_error_message(str(e)))
+
+    if not models:
+        raise ValueError("No available LLM API keys found. Please set GEMINI_API_KEY or DEEPSEEK_API_KEY in .env file")
+
+    primary, *fallbacks = [_with_retry(model) for model in models]
+    if fallbacks:
+        # LangChain transparently switches provider if the primary still fails after retries
+        return primary.with_fallbacks(fallbacks)
+    return primary
+
+
+def get_context_cached_model(system_prompt: str, temperature: float = 0.7):
+    """
+    Get a Gemini model whose static system prompt lives in Gemini's context
+    cache, so long prompts are not re-prefilled on every turn.
+
+    Only used when GEMINI_CONTEXT_CACHE_TTL is set. Requests made with the
+    returned model must NOT include the system prompt again.
+
+    Args:
+        system_prompt: Static system instructions to cache
+        temperature: Sampling temperature for the model
+
+    Returns:
+        LLM model instance bound to the cached content, or None if context
+        caching is disabled or unavailable (callers then send the prompt inline)
+    """
+    if not (GEMINI_CONTEXT_CACHE_TTL > 0 and GEMINI_AVAILABLE and GEMINI_API_KEY):
+        return None
+    cache_name = _create_gemini_context_cache(system_prompt, GEMINI_CONTEXT_CACHE_TTL)
+    if cache_name is None:
+        return None
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return _with_retry(ChatGoogleGenerativeAI(
+        model=GEMINI_MODEL,
+        temperature=temperature,
+        cached_content=cache_name
+    ))
+
+
+def _create_gemini_context_cache(system_prompt: str, ttl_seconds: int) -> Optional[str]:
+    """Upload system_prompt to Gemini's context cache and return the cache name."""
+    try:
+        from google import genai
+        from google.genai import types
+    except ImportError:
+        logger.warning("google-genai not installed. Gemini context caching unavailable.")
+        return None
+
+    try:
+        client = genai.Client(api_key=GEMINI_API_KEY)
+        cached = client.caches.create(
+            model=GEMINI_MODEL,
+            config=types.CreateCachedContentConfig(
+                system_instruction=system_prompt,
+                ttl=f"{ttl_seconds}s"
+            )
+        )
+        logger.debug("Created Gemini context cache %s", cached.name)
+        return cached.name
+    except Exception as e:
+        # Prompts below the provider's minimum cacheable size end up here too
+        if logger.isEnabledFor(logging.WARNING):
+            logger.warning("Failed to create Gemini context cache: %s", sanitize_error_message(str(e)))
+        return None
@@ -2,58 +2,124 @@
 Email Writing Agent
 Helps HR write professional emails with or without candidate context.
 """
+import json
+import re
+from pathlib import Path
+from typing import Optional
+from jinja2 import Environment, FileSystemLoader
 from langchain_core.prompts import PromptTemplate
-from config import GEMINI_API_KEY, DEEPSEEK_API_KEY
 from utils.logger import get_logger, sanitize_error_message
+from agents._llm import get_llm_model
+from utils.json_parser import extract_json_object, loads as json_loads
 
 logger = get_logger(__name__)
 
-# Try to import Gemini
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    logger.warning("langchain-google-genai not installed. Gemini support unavailable.")
-
-
-def get_llm_model():
-    """Get available LLM model (Gemini or DeepSeek)."""
-    if GEMINI_AVAILABLE and GEMINI_API_KEY:
-        try:
-            # Use environment variable instead of passing key directly
-            # This prevents API key exposure in error messages
-            model = ChatGoogleGenerativeAI(
-                model="models/gemini-2.5-flash",
-                temperature=0.7
-            )
-            return model
-        except Exception as e:
-            # Sanitize error message to prevent API key exposure
-            error_msg = sanitize_error_message(str(e))
-            logger.warning(f"Failed to initialize Gemini: {error_msg}")
-    
-    if DEEPSEEK_API_KEY:
-        try:
-            from langchain_openai import ChatOpenAI
-            model = ChatOpenAI(
-                base_url="https://api.deepseek.com/v1",
-                model="deepseek-chat",
-                temperature=0.7,
-                openai_api_key=DEEPSEEK_API_KEY
-            )
-            return model
-        except Exception as e:
-            logger.warning(f"Failed to initialize DeepSeek: {e}")
-    
-    raise ValueError("No available LLM API keys found")
+_SUBJECT_RE = re.compile(r'subject[:\s]+([^\n]+)', re.IGNORECASE)
+# [placeholder], {placeholder} and <placeholder> patterns stripped from bodies
+_SQUARE_PLACEHOLDER_RE = re.compile(r'\[.*?\]')
+_CURLY_PLACEHOLDER_RE = re.compile(r'\{.*?\}')
+_ANGLE_PLACEHOLDER_RE = re.compile(r'<.*?>')
+
+# Near-static HR emails rendered from agents/templates/ without an LLM call.
+# Checked in order, so a "reject" request mentioning the interview wins.
+_TEMPLATE_KEYWORDS = (
+    ("reject", frozenset({"reject", "rejection", "decline", "unsuccessful", "not selected", "not moving forward"})),
+    ("schedule", frozenset({"schedule", "invite", "invitation"})),
+    ("acknowledge", frozenset({"acknowledge", "acknowledgement", "acknowledgment", "received", "confirm receipt"})),
+)
+_TEMPLATE_SUBJECTS = {
+    "reject": "Update on Your Application",
+    "schedule": "Interview Invitation",
+    "acknowledge": "Application Received",
+}
+_TEMPLATE_INTENT_RE = re.compile(
+    "|".join(
+        # Longest first, so "rejection" is not matched as "reject" + "ion"
+        rf"\b(?P<{intent}>{'|'.join(re.escape(kw) for kw in sorted(kws, key=len, reverse=True))})\b"
+        for intent, kws in _TEMPLATE_KEYWORDS
+    ),
+    re.IGNORECASE
+)
+# Concrete dates, times or extra instructions the static templates cannot carry
+_TEMPLATE_SPECIFICS_RE = re.compile(
+    r'\d|\b(?:monday|tuesday|wednesday|thursday|friday|saturday|sunday|'
+    r'today|tomorrow|next week|mention|include|salary|offer)\b',
+    re.IGNORECASE
+)
+_TEMPLATE_MAX_PROMPT_LENGTH = 200
+# Outside the intent keyword, a templated prompt may only contain these words;
+# anything else ("ask for references", "follow our LinkedIn page") is an
+# instruction the template would silently drop
+_TEMPLATE_FILLER_WORDS = frozenset({
+    "a", "an", "the", "to", "for", "of", "with", "and", "about", "regarding",
+    "please", "kindly", "email", "mail", "message", "letter", "note", "reply",
+    "draft", "write", "send", "compose", "prepare", "create", "generate",
+    "candidate", "applicant", "them", "him", "her", "they", "he", "she", "their", "his",
+    "this", "that", "we", "our", "i", "have", "has", "was", "is", "been",
+    "interview", "application", "resume", "cv",
+    "formal", "polite", "short", "brief", "professional", "friendly", "standard",
+})
+_TEMPLATE_WORD_RE = re.compile(r"[a-z]+(?:['’][a-z]+)?")
+_TEMPLATE_NEGATION_RE = re.compile(
+    r"\b(?:not|no|never|without|yet|instead|unless|but)\b|n['’]t\b",
+    re.IGNORECASE
+)
+
+_template_env = Environment(
+    loader=FileSystemLoader(str(Path(__file__).parent / "templates")),
+    trim_blocks=True,
+    autoescape=False
+)
+
+
+def _detect_template_intent(user_prompt: str) -> Optional[str]:
+    """
+    Return the template name for a near-static request, or None.
+
+    Prompts that are long, carry dates/times/extra details, match more than
+    one intent, negate the intent or add any other instruction go to the LLM
+    instead.
+    """
+    if len(user_prompt) > _TEMPLATE_MAX_PROMPT_LENGTH or _TEMPLATE_SPECIFICS_RE.search(user_prompt):
+        return None
+    intents = {match.lastgroup for match in _TEMPLATE_INTENT_RE.finditer(user_prompt)}
+    if len(intents) != 1:
+        return None
+    # Keywords such as "not selected" are removed before looking for negations
+    rest = _TEMPLATE_INTENT_RE.sub(" ", user_prompt).lower()
+    if _TEMPLATE_NEGATION_RE.search(rest):
+        return None
+    if not _TEMPLATE_FILLER_WORDS.issuperset(_TEMPLATE_WORD_RE.findall(rest)):
+        return None
+    return intents.pop()
+
+
+def _render_template_email(intent: str, candidate_data: dict, job_description: str) -> dict:
+    """Render a templated email for the candidate."""
+    candidate_email = candidate_data.get('email', '')
+    if "@" in candidate_email:
+        candidate_name = candidate_email.split("@")[0].split(".")[0].capitalize()
+    else:
+        candidate_name = "Candidate"
+
+    body = _template_env.get_template(f"{intent}.j2").render(
+        candidate=candidate_data,
+        candidate_name=candidate_name,
+        key_strengths=", ".join(candidate_data.get('key_strengths', [])[:2]),
+        jd_excerpt=job_description[:500]
+    )
+    return {
+        "subject": _TEMPLATE_SUBJECTS[intent],
+        "body": body.strip()
+    }
 
 
 def generate_email_with_ai(
     user_prompt: str,
     use_candidate_context: bool = False,
     candidate_data: dict = None,
-    job_description: str = None
+    job_description: str = None,
+    bypass_cache: bool = False
 ) -> dict:
     """
     Generate email subject and body using AI.
@@ -63,12 +129,19 @@ def generate_email_with_ai(
         use_candidate_context: Whether to use candidate data
         candidate_data: Candidate information (if use_candidate_context is True)
         job_description: Job description text (if use_candidate_context is True)
+        bypass_cache: Skip the LLM response cache to force a fresh draft
         
     Returns:
         Dictionary with 'subject' and 'body' keys
     """
     try:
-        model = get_llm_model()
+        if use_candidate_context and candidate_data and job_description and not bypass_cache:
+            intent = _detect_template_intent(user_prompt)
+            if intent:
+                logger.debug("Rendering %s email from template", intent)
+                return _render_template_email(intent, candidate_data, job_description)
+
+        model = get_llm_model(temperature=0.7, cache=not bypass_cache)
         
         if use_candidate_context and candidate_data and job_description:
             # Use candidate context
@@ -101,16 +174,13 @@ def generate_email_with_ai(
         response_text = response.content if hasattr(response, "content") else str(response)
         
         # Try to extract JSON
-        import json
-        import re
-        
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
+        json_str = extract_json_object(response_text)
+        if json_str:
             try:
-                result = json.loads(json_match.group(0))
+                result = json_loads(json_str)
                 body = result.get("body", "")
-                body = re.sub(r'\[.*?\]', '', body)  # Remove [placeholder] patterns
-                body = re.sub(r'<.*?>', '', body)  # Remove <placeholder> patterns
+                body = _SQUARE_PLACEHOLDER_RE.sub('', body)  # Remove [placeholder] patterns
+                body = _ANGLE_PLACEHOLDER_RE.sub('', body)  # Remove <placeholder> patterns
                 body = body.strip()
                 
                 return {
@@ -120,16 +190,16 @@ def generate_email_with_ai(
             except json.JSONDecodeError:
                 pass
 
-        subject_match = re.search(r'subject[:\s]+([^\n]+)', response_text, re.IGNORECASE)
+        subject_match = _SUBJECT_RE.search(response_text)
         subject = subject_match.group(1).strip() if subject_match else "No Subject"
 
         body = response_text
         if subject_match:
             body = response_text[subject_match.end():].strip()
 
-        body = re.sub(r'\[.*?\]', '', body)
-        body = re.sub(r'\{.*?\}', '', body) 
-        body = re.sub(r'<.*?>', '', body)
+        body = _SQUARE_PLACEHOLDER_RE.sub('', body)
+        body = _CURLY_PLACEHOLDER_RE.sub('', body)
+        body = _ANGLE_PLACEHOLDER_RE.sub('', body)
         body = body.strip()
         
         return {
@@ -140,6 +210,6 @@ def generate_email_with_ai(
     except Exception as e:
         # Sanitize error message to prevent API key exposure
         error_msg = sanitize_error_message(str(e))
-        logger.error(f"Error generating email: {error_msg}")
+        logger.error("Error generating email: %s", error_msg)
         raise ValueError(f"Failed to generate email: {error_msg}")
 
@@ -1,97 +1,164 @@
+import json
+import re
+from typing import List, Optional
+from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import PromptTemplate
-from config import GEMINI_API_KEY, DEEPSEEK_API_KEY  # Import API keys from config
-from utils.logger import get_logger, sanitize_error_message
+from utils.logger import get_logger
+from agents._llm import get_llm_model
 
 from utils.formatter import clean_text, format_email
 
 logger = get_logger(__name__)
 
-# Try to import Gemini
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    logger.warning("langchain-google-genai not installed. Gemini support unavailable.")
+# Maximum number of emails packed into a single classification prompt
+BATCH_SIZE = 20
+
+_FILTER_PROMPT = PromptTemplate(
+    input_variables=["subject", "content"],
+    template=(
+        "Analyze the following email with subject: {subject} and content: {content} "
+        "and classify the email type. "
+        "Classify it as 'spam', 'urgent', 'informational', or 'needs review'."
+    )
+)
+
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
+
+
+def _classify_text(classification_text: str) -> str:
+    """Map raw model output onto one of the supported labels."""
+    # Check for 'needs review' first
+    if "'needs review'" in classification_text or "needs review" in classification_text:
+        return "needs_review"
+    elif "urgent" in classification_text:
+        return "urgent"
+    elif "spam" in classification_text:
+        return "spam"
+    else:
+        return "informational"
 
 
 def filter_email(email: dict) -> str:
     """
     Uses an LLM to analyze the email and classify its type.
-    
+
     The email is classified as one of:
       - "spam"
       - "urgent"
       - "needs_review"
       - "informational"
-    
+
     Arguments:
         email (dict): The email to be analyzed. Expected keys: "subject", "body".
-    
+
     Returns:
         str: The classification result.
     """
-    prompt_template = PromptTemplate(
-        input_variables=["subject", "content"],
-        template=(
-            "Analyze the following email with subject: {subject} and content: {content} "
-            "and classify the email type. "
-            "Classify it as 'spam', 'urgent', 'informational', or 'needs review'."
-        )
-    )
-    
-    prompt = prompt_template.format(
+    prompt = _FILTER_PROMPT.format(
         subject=email.get("subject", ""),
         content=email.get("body", "")
     )
-    
-    # Try Gemini first, then DeepSeek as fallback
-    model = None
-    if GEMINI_AVAILABLE and GEMINI_API_KEY:
-        try:
-            # Use environment variable instead of passing key directly
-            # This prevents API key exposure in error messages
-            model = ChatGoogleGenerativeAI(
-                model="models/gemini-2.5-flash",
-                temperature=0.2
-            )
-            logger.debug("Using Gemini model for email filtering")
-        except Exception as e:
-            # Sanitize error message to prevent API key exposure
-            error_msg = sanitize_error_message(str(e))
-            logger.warning(f"Failed to initialize Gemini: {error_msg}")
-    
-    if model is None and DEEPSEEK_API_KEY:
-        try:
-            from langchain_openai import ChatOpenAI
-            model = ChatOpenAI(
-                base_url="https://api.deepseek.com/v1",
-                model="deepseek-chat",
-                temperature=0.2,
-                openai_api_key=DEEPSEEK_API_KEY
-            )
-            logger.debug("Using DeepSeek model for email filtering (fallback)")
-        except Exception as e:
-            logger.warning(f"Failed to initialize DeepSeek: {e}")
-    
-    if model is None:
-        raise ValueError("No available LLM API keys found. Please set GEMINI_API_KEY or DEEPSEEK_API_KEY in .env file")
-
-    classification_result = model.invoke(prompt) 
-    
-    classification_text = clean_text(str(classification_result))    
+
+    # Shared, memoized client (Gemini first, DeepSeek as fallback)
+    model = get_llm_model(temperature=0.2)
+
+    classification_result = model.invoke(prompt)
+
+    classification_text = clean_text(str(classification_result))
 
 
         # logss the raw model output for debugging.
     logger.debug("Raw model output: %s", classification_text)
-    
-    
-    # Check for 'needs review' first
-    if "'needs review'" in classification_text or "needs review" in classification_text:
-        return "needs_review"
-    elif "urgent" in classification_text:
-        return "urgent"
-    elif "spam" in classification_text:
-        return "spam"
-    else:
-        return "informational"
\ No newline at end of file
+
+    return _classify_text(classification_text)
+
+
+def _build_batch_prompt(emails: List[dict]) -> str:
+    """Pack several emails into one indexed classification prompt."""
+    sections = [
+        f"[{i}] subject: {email.get('subject', '')}\nbody: {email.get('body', '')}"
+        for i, email in enumerate(emails, 1)
+    ]
+    return (
+        "Classify each email below as 'spam', 'urgent', 'informational', or 'needs review'.\n"
+        "Return ONLY a JSON array of labels, one per email, in the same order.\n\n"
+        + "\n\n".join(sections)
+    )
+
+
+def _parse_batch_labels(response_text: str, expected: int) -> Optional[List[str]]:
+    """Parse the JSON label array; None if it is missing or the wrong length."""
+    match = _JSON_ARRAY_RE.search(response_text)
+    if not match:
+        return None
+    try:
+        labels = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(labels, list) or len(labels) != expected:
+        return None
+    return [_classify_text(str(label).lower().replace("_", " ")) for label in labels]
+
+
+def filter_emails_batch(emails: List[dict], batch_size: int = BATCH_SIZE) -> List[str]:
+    """
+    Classify many emails with one LLM call per batch instead of one per email.
+
+    Arguments:
+        emails (list): Emails to classify. Expected keys: "subject", "body".
+        batch_size (int): Maximum number of emails packed into one prompt.
+
+    Returns:
+        list: Classification results in the same order as ``emails``.
+    """
+    model = get_llm_model(temperature=0.2)
+    results = []
+    for start in range(0, len(emails), batch_size):
+        batch = emails[start:start + batch_size]
+        response = model.invoke(_build_batch_prompt(batch))
+        response_text = response.content if hasattr(response, "content") else str(response)
+        labels = _parse_batch_labels(response_text, len(batch))
+        if labels is None:
+            # Fall back to classifying this batch one email at a time
+            logger.warning("Failed to parse batch classification, falling back to per-email calls")
+            labels = [filter_email(email) for email in batch]
+        results.extend(labels)
+    return results
+
+
+async def afilter_emails(emails: List[dict]) -> List[str]:
+    """
+    Classify emails concurrently via the model's async batch interface.
+
+    Arguments:
+        emails (list): Emails to classify. Expected keys: "subject", "body".
+
+    Returns:
+        list: Classification results in the same order as ``emails``.
+    """
+    model = get_llm_model(temperature=0.2)
+    prompts = [
+        _FILTER_PROMPT.format(subject=email.get("subject", ""), content=email.get("body", ""))
+        for email in emails
+    ]
+    responses = await model.abatch(prompts)
+    return [_classify_text(clean_text(str(response))) for response in responses]
+
+
+def filter_emails_concurrent(emails: List[dict], max_concurrency: int = 8) -> List[str]:
+    """
+    Classify emails one prompt each, with up to max_concurrency requests in flight.
+
+    Arguments:
+        emails (list): Emails to classify. Expected keys: "subject", "body".
+        max_concurrency (int): Maximum number of parallel provider requests.
+
+    Returns:
+        list: Classification results in the same order as ``emails``.
+    """
+    chain = _FILTER_PROMPT | get_llm_model(temperature=0.2) | StrOutputParser()
+    responses = chain.batch(
+        [{"subject": email.get("subject", ""), "content": email.get("body", "")} for email in emails],
+        config={"max_concurrency": max_concurrency}
+    )
+    return [_classify_text(clean_text(response)) for response in responses]
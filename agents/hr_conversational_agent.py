@@ -3,70 +3,70 @@ HR Conversational Agent
 A conversational agent that can answer HR queries about candidates,
 generate emails based on job descriptions, and send emails to candidates.
 """
+import asyncio
+import copy
+import functools
 import re
-from typing import Dict, Optional, Tuple
+import textwrap
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
-from langchain_community.chat_message_histories import ChatMessageHistory
-from config import DEEPSEEK_API_KEY, GEMINI_API_KEY
-from utils.logger import get_logger, sanitize_error_message
-from core.email_sender import send_email as send_email_smtp
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from utils.logger import get_logger
+from agents._llm import get_llm_model, get_context_cached_model
+from core.email_sender import SMTPPool
 from utils.formatter import format_email
 
 logger = get_logger(__name__)
 
-# Try to import Gemini
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    logger.warning("langchain-google-genai not installed. Gemini support unavailable.")
+_EMAIL_KWS = frozenset({
+    "prepare email", "create email", "write email", "draft email",
+    "generate email", "compose email", "make email", "email to candidate"
+})
+_SEND_KWS = frozenset({
+    "send email", "send it", "send the email", "send now",
+    "dispatch email", "email send"
+})
 
+# Single-pass intent scanner: one alternation over every keyword, tagged by
+# intent group. Wrapped in a lookahead so overlapping keywords are all seen
+# ("send email to candidate" yields both "send email" and "email to candidate").
+_INTENT_RE = re.compile(
+    "(?=(?P<email>{})|(?P<send>{}))".format(
+        "|".join(map(re.escape, sorted(_EMAIL_KWS))),
+        "|".join(map(re.escape, sorted(_SEND_KWS)))
+    ),
+    re.IGNORECASE
+)
+_SUBJECT_RE = re.compile(r'subject[:\s]+([^\n]+)', re.IGNORECASE)
 
-def get_llm_model():
-    """
-    Get an available LLM model (Gemini or DeepSeek).
-    Prefers Gemini if both are available.
-    
-    Returns:
-        LLM model instance
-        
-    Raises:
-        ValueError: If no API keys are available
-    """
-    # Try Gemini first
-    if GEMINI_AVAILABLE and GEMINI_API_KEY:
-        try:
-            # Use environment variable instead of passing key directly
-            # This prevents API key exposure in error messages
-            model = ChatGoogleGenerativeAI(
-                model="models/gemini-2.5-flash",
-                temperature=0.7
-            )
-            logger.info("Using Gemini model for HR agent")
-            return model
-        except Exception as e:
-            # Sanitize error message to prevent API key exposure
-            error_msg = sanitize_error_message(str(e))
-            logger.warning(f"Failed to initialize Gemini: {error_msg}")
-    
-    # Try DeepSeek as fallback if Gemini is not available
-    if DEEPSEEK_API_KEY:
-        try:
-            from langchain_openai import ChatOpenAI
-            model = ChatOpenAI(
-                base_url="https://api.deepseek.com/v1",
-                model="deepseek-chat",
-                temperature=0.7,
-                openai_api_key=DEEPSEEK_API_KEY
-            )
-            logger.info("Using DeepSeek model for HR agent (fallback)")
-            return model
-        except Exception as e:
-            logger.warning(f"Failed to initialize DeepSeek: {e}")
-    
-    raise ValueError("No available LLM API keys found. Please set GEMINI_API_KEY or DEEPSEEK_API_KEY in .env file")
+# System prompt for the HR agent, filled once per agent with str.format()
+_SYSTEM_TEMPLATE = textwrap.dedent("""\
+    You are an expert HR assistant helping with candidate evaluation and communication. You have access to the candidate's resume information and the job description. ALWAYS use this information to answer questions accurately.
+
+    === CANDIDATE INFORMATION ===
+    Candidate Email: {candidate_email}
+    Match Percentage: {match_percentage}%
+    Position Level Fit: {position_level}
+    Acceptance Probability: {acceptance_probability}
+    Key Strengths: {key_strengths}
+    Key Gaps: {key_gaps}
+
+    Detailed Candidate Analysis:
+    {detailed_analysis}
+    {resume_excerpt}
+
+    === JOB DESCRIPTION ===
+    {job_description}
+
+    === YOUR ROLE ===
+    You MUST use the candidate and job information provided above to answer ALL questions. When asked about:
+    - Candidate email: Provide {candidate_email}
+    - Job match: Use the match percentage ({match_percentage}%) and detailed analysis
+    - Candidate experience/skills: Refer to the resume information and analysis above
+    - Any candidate details: Use the information provided in the candidate section
+
+    IMPORTANT: You have the candidate and job information. Use it to answer questions directly. Do NOT ask for information that is already provided above.""")
 
 
 class HRConversationalAgent:
@@ -89,10 +89,17 @@ class HRConversationalAgent:
         self.job_description_text = job_description_text
         self.candidate_email = candidate_email
         self.hr_name = hr_name
-        self.llm = get_llm_model()
+        self.llm = get_llm_model(temperature=0.7)
+        
+        # Bounded context slices, computed once instead of on every turn
+        self._jd_short = self.job_description_text[:1000]
+        self._jd_mid = self.job_description_text[:2500]
+        self._resume_excerpt = (self.resume_data.get("resume_text") or "")[:1500]
+        self._strengths_joined = ", ".join(self.resume_data.get("key_strengths", []))
         
-        # Initialize conversation memory using ChatMessageHistory (LangChain 1.0+)
-        self.message_history = ChatMessageHistory()
+        # Conversation memory: human/AI turns only, appended in O(1) per turn.
+        # The system prompt lives in self._system_prompt
+        self._history: List[BaseMessage] = []
         
         # Set up system prompt with context
         self._initialize_context()
@@ -103,39 +110,44 @@ class HRConversationalAgent:
         match_percentage = self.resume_data.get("match_percentage", 0)
         position_level = self.resume_data.get("position_level", "Unknown")
         acceptance_probability = self.resume_data.get("acceptance_probability", "Unknown")
-        key_strengths = self.resume_data.get("key_strengths", [])
         key_gaps = self.resume_data.get("key_gaps", [])
         
-        # Get full resume text if available (for better context)
-        full_resume_text = self.resume_data.get("resume_text", "")[:2000] if "resume_text" in self.resume_data else ""
+        # Include the resume text excerpt if available (for better context)
+        resume_excerpt = f"\nResume Text Excerpt:\n{self._resume_excerpt}" if self._resume_excerpt else ""
         
-        system_prompt = (
-            f"You are an expert HR assistant helping with candidate evaluation and communication. "
-            f"You have access to the candidate's resume information and the job description. "
-            f"ALWAYS use this information to answer questions accurately.\n\n"
-            f"=== CANDIDATE INFORMATION ===\n"
-            f"Candidate Email: {self.candidate_email}\n"
-            f"Match Percentage: {match_percentage}%\n"
-            f"Position Level Fit: {position_level}\n"
-            f"Acceptance Probability: {acceptance_probability}\n"
-            f"Key Strengths: {', '.join(key_strengths) if key_strengths else 'None specified'}\n"
-            f"Key Gaps: {', '.join(key_gaps) if key_gaps else 'None specified'}\n"
-            f"\nDetailed Candidate Analysis:\n{resume_text}\n"
-            f"{f'\nResume Text Excerpt:\n{full_resume_text[:1500]}' if full_resume_text else ''}\n\n"
-            f"=== JOB DESCRIPTION ===\n{self.job_description_text[:2500]}\n\n"
-            f"=== YOUR ROLE ===\n"
-            f"You MUST use the candidate and job information provided above to answer ALL questions. "
-            f"When asked about:\n"
-            f"- Candidate email: Provide {self.candidate_email}\n"
-            f"- Job match: Use the match percentage ({match_percentage}%) and detailed analysis\n"
-            f"- Candidate experience/skills: Refer to the resume information and analysis above\n"
-            f"- Any candidate details: Use the information provided in the candidate section\n\n"
-            f"IMPORTANT: You have the candidate and job information. Use it to answer questions directly. "
-            f"Do NOT ask for information that is already provided above."
+        system_prompt = _SYSTEM_TEMPLATE.format(
+            candidate_email=self.candidate_email,
+            match_percentage=match_percentage,
+            position_level=position_level,
+            acceptance_probability=acceptance_probability,
+            key_strengths=self._strengths_joined or 'None specified',
+            key_gaps=', '.join(key_gaps) if key_gaps else 'None specified',
+            detailed_analysis=resume_text,
+            resume_excerpt=resume_excerpt,
+            job_description=self._jd_mid
         )
         
-        # Add system message to message history
-        self.message_history.add_message(SystemMessage(content=system_prompt))
+        # Built once per agent and reused on every turn; the prompt | llm
+        # chain is compiled lazily on the first chat() turn
+        self._system_prompt = system_prompt
+        self._chain = None
+        # Forks share the chain and this lock, so it is compiled only once
+        self._chain_lock = threading.Lock()
+    
+    def fork(self) -> "HRConversationalAgent":
+        """
+        Return a new agent for the same candidate with empty conversation memory.
+        
+        The prepared context and the compiled chain (compiled here if needed)
+        are shared, so a long-lived agent can serve many independent
+        conversations without rebuilding them.
+        """
+        with self._chain_lock:
+            self._get_chain()
+        forked = copy.copy(self)
+        forked._history = []
+        forked.__dict__.pop("generated_email", None)
+        return forked
     
     def chat(self, query: str, smtp_username: str = None, smtp_password: str = None,
              smtp_server: str = None, smtp_port: str = None) -> str:
@@ -152,12 +164,14 @@ class HRConversationalAgent:
         Returns:
             Agent's response
         """
+        intent = self._detect_intent(query)
+        
         # Check if this is an email generation request
-        if self._is_email_request(query):
+        if intent == "email":
             return self._generate_email(query)
         
         # Check if this is a send email request
-        if self._is_send_request(query):
+        if intent == "send":
             return self._handle_send_request(
                 smtp_username=smtp_username,
                 smtp_password=smtp_password,
@@ -166,70 +180,146 @@ class HRConversationalAgent:
             )
         
         # Regular query - use modern LangChain 1.0+ approach
-        # Build messages list with system context and conversation history
-        messages_list = []
-        
-        # Get system message (contains all context about candidate and job)
-        system_msgs = [msg for msg in self.message_history.messages if isinstance(msg, SystemMessage)]
-        if system_msgs:
-            messages_list.append(("system", system_msgs[0].content))
-        else:
-            # If no system message, recreate it (shouldn't happen, but safety check)
-            self._initialize_context()
-            system_msgs = [msg for msg in self.message_history.messages if isinstance(msg, SystemMessage)]
-            if system_msgs:
-                messages_list.append(("system", system_msgs[0].content))
-        
-        # Add conversation history (excluding system messages)
-        conversation_msgs = [msg for msg in self.message_history.messages if not isinstance(msg, SystemMessage)]
-        for msg in conversation_msgs:
-            if isinstance(msg, HumanMessage):
-                messages_list.append(("human", msg.content))
-            elif isinstance(msg, AIMessage):
-                messages_list.append(("ai", msg.content))
-        
-        # Add current user query with context reminder for important queries
-        user_query = query
-        # Add context hint for queries about email or match
-        if any(keyword in query.lower() for keyword in ['email', 'match', 'candidate', 'job', 'experience', 'skill']):
-            # The system message already has all context, but we ensure it's clear
-            pass
-        
-        messages_list.append(("human", "{input}"))
-        
-        # Create prompt template with all messages
-        prompt = ChatPromptTemplate.from_messages(messages_list)
-        
-        # Create chain and invoke
-        chain = prompt | self.llm
-        response = chain.invoke({"input": user_query})
+        # (the system message already carries the candidate/job context)
+        response = self._get_chain().invoke({
+            "input": query,
+            "history": self._history
+        })
+        
+        return self._record_turn(query, response)
+    
+    def chat_stream(self, query: str, smtp_username: str = None, smtp_password: str = None,
+                    smtp_server: str = None, smtp_port: str = None) -> Iterator[str]:
+        """
+        Streaming version of chat(): yields the response as it is generated,
+        so callers can show the first tokens instead of waiting for the full answer.
+        The complete response is added to the history once the stream ends.
+        
+        Email drafts (formatted after generation) and send requests (no LLM
+        call) are yielded as a single chunk.
+        
+        Args:
+            query: The HR's question or instruction
+            smtp_username: Optional SMTP username for sending emails
+            smtp_password: Optional SMTP password for sending emails
+            smtp_server: Optional SMTP server for sending emails
+            smtp_port: Optional SMTP port for sending emails
+            
+        Yields:
+            Chunks of the agent's response
+        """
+        if self._detect_intent(query) is not None:
+            yield self.chat(
+                query,
+                smtp_username=smtp_username,
+                smtp_password=smtp_password,
+                smtp_server=smtp_server,
+                smtp_port=smtp_port
+            )
+            return
         
+        chunks = []
+        for chunk in self._get_chain().stream({
+            "input": query,
+            "history": self._history
+        }):
+            text = chunk.content if hasattr(chunk, "content") else str(chunk)
+            if text:
+                chunks.append(text)
+                yield text
+        
+        self._record_turn(query, "".join(chunks))
+    
+    async def achat(self, query: str, smtp_username: str = None, smtp_password: str = None,
+                    smtp_server: str = None, smtp_port: str = None) -> str:
+        """
+        Async version of chat(): awaits the LLM instead of blocking, so many
+        agents can be driven concurrently (see bulk_process).
+        
+        Args:
+            query: The HR's question or instruction
+            smtp_username: Optional SMTP username for sending emails
+            smtp_password: Optional SMTP password for sending emails
+            smtp_server: Optional SMTP server for sending emails
+            smtp_port: Optional SMTP port for sending emails
+            
+        Returns:
+            Agent's response
+        """
+        intent = self._detect_intent(query)
+        
+        if intent == "email":
+            subject, email_prompt = self._build_email_prompt(query)
+            response = await self.llm.ainvoke(email_prompt)
+            return self._store_generated_email(subject, response)
+        
+        if intent == "send":
+            # smtplib is blocking; run it off the event loop
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, functools.partial(
+                self._handle_send_request,
+                smtp_username=smtp_username,
+                smtp_password=smtp_password,
+                smtp_server=smtp_server,
+                smtp_port=smtp_port
+            ))
+        
+        response = await self._get_chain().ainvoke({
+            "input": query,
+            "history": self._history
+        })
+        
+        return self._record_turn(query, response)
+    
+    def _record_turn(self, user_query: str, response) -> str:
+        """Extract the response text and append the turn to the history."""
         # Extract response content
         response_text = response.content if hasattr(response, "content") else str(response)
         
         # Add user message and AI response to history (after getting response)
-        self.message_history.add_user_message(user_query)
-        self.message_history.add_ai_message(response_text)
+        self._history.append(HumanMessage(content=user_query))
+        self._history.append(AIMessage(content=response_text))
         
         return response_text
     
-    def _is_email_request(self, query: str) -> bool:
-        """Check if the query is requesting email generation."""
-        email_keywords = [
-            "prepare email", "create email", "write email", "draft email",
-            "generate email", "compose email", "make email", "email to candidate"
-        ]
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in email_keywords)
+    def _get_chain(self):
+        """Return the prompt | llm chain, compiling it on first use."""
+        if self._chain is None:
+            # With Gemini context caching the system prompt is already on the
+            # provider side and is referenced, not resent, on every turn
+            cached_llm = get_context_cached_model(self._system_prompt, temperature=0.7)
+            if cached_llm is not None:
+                prompt = ChatPromptTemplate.from_messages([
+                    MessagesPlaceholder("history"),
+                    ("human", "{input}")
+                ])
+                self._chain = prompt | cached_llm
+                return self._chain
+            
+            prompt = ChatPromptTemplate.from_messages([
+                # A message object (not a template tuple) so braces in the
+                # resume / job description are never parsed as variables
+                SystemMessage(content=self._system_prompt),
+                MessagesPlaceholder("history"),
+                ("human", "{input}")
+            ])
+            self._chain = prompt | self.llm
+        return self._chain
     
-    def _is_send_request(self, query: str) -> bool:
-        """Check if the query is requesting to send an email."""
-        send_keywords = [
-            "send email", "send it", "send the email", "send now",
-            "dispatch email", "email send"
-        ]
-        query_lower = query.lower()
-        return any(keyword in query_lower for keyword in send_keywords)
+    def _detect_intent(self, query: str) -> Optional[str]:
+        """
+        Classify the query in one scan.
+        
+        Returns:
+            "email" for email generation, "send" for sending, None otherwise.
+            Email generation wins when both kinds of keyword are present.
+        """
+        intent = None
+        for match in _INTENT_RE.finditer(query):
+            if match.lastgroup == "email":
+                return "email"
+            intent = "send"
+        return intent
     
     def _generate_email(self, query: str) -> str:
         """
@@ -241,25 +331,33 @@ class HRConversationalAgent:
         Returns:
             Generated email content
         """
+        subject, email_prompt = self._build_email_prompt(query)
+        response = self.llm.invoke(email_prompt)
+        return self._store_generated_email(subject, response)
+    
+    def _build_email_prompt(self, query: str) -> Tuple[str, str]:
+        """Return the (subject, LLM prompt) pair for an email generation request."""
         # Extract email subject if mentioned
-        subject_match = re.search(r'subject[:\s]+([^\n]+)', query, re.IGNORECASE)
+        subject_match = _SUBJECT_RE.search(query)
         subject = subject_match.group(1).strip() if subject_match else "Regarding Your Application"
         
         # Create prompt for email generation
         email_prompt = (
             f"Generate a professional email to the candidate based on the following instructions:\n\n"
             f"HR Instructions: {query}\n\n"
-            f"Job Description Context:\n{self.job_description_text[:1000]}...\n\n"
+            f"Job Description Context:\n{self._jd_short}...\n\n"
             f"Candidate Context:\n"
             f"- Match: {self.resume_data.get('match_percentage', 0)}%\n"
             f"- Level: {self.resume_data.get('position_level', 'Unknown')}\n"
-            f"- Strengths: {', '.join(self.resume_data.get('key_strengths', []))}\n\n"
+            f"- Strengths: {self._strengths_joined}\n\n"
             f"Generate ONLY the email body content (without subject, greeting, or signature). "
             f"Make it professional, personalized, and relevant. Include specific details from the job description. "
             f"Keep it concise but comprehensive."
         )
-        
-        response = self.llm.invoke(email_prompt)
+        return subject, email_prompt
+    
+    def _store_generated_email(self, subject: str, response) -> str:
+        """Remember the generated email for a later send and format it for display."""
         email_body = response.content if hasattr(response, "content") else str(response)
         
         # Store the generated email
@@ -320,7 +418,7 @@ class HRConversationalAgent:
             else:
                 return f"❌ Failed to send email to {self.candidate_email}. Please check your email configuration."
         except Exception as e:
-            logger.error(f"Error sending email: {e}")
+            logger.error("Error sending email: %s", e)
             return f"❌ Error sending email: {str(e)}"
     
     def _send_email_to_candidate(self, subject: str, body: str, recipient_email: str,
@@ -343,7 +441,6 @@ class HRConversationalAgent:
         """
         try:
             from email.message import EmailMessage
-            import smtplib
             from config import EMAIL_SERVER, EMAIL_PASSWORD, EMAIL_USERNAME, EMAIL_PORT
             
             # Use provided credentials or fall back to config
@@ -356,9 +453,6 @@ class HRConversationalAgent:
                 logger.error("Missing email credentials")
                 return False
             
-            # Format the email (format_email adds "Re: " prefix, so we'll format manually for new emails)
-            candidate_name = self._extract_candidate_name()
-            
             # Use body exactly as provided - no automatic greetings or signatures
             # User has full control over email content
             formatted_content = body.strip()
@@ -369,19 +463,14 @@ class HRConversationalAgent:
             msg["To"] = recipient_email
             msg.set_content(formatted_content)
             
-            logger.debug(f"Connecting to SMTP server {server_addr}:{port}")
-            with smtplib.SMTP(server_addr, int(port)) as server:
-                logger.debug("Starting TLS...")
-                server.starttls()
-                logger.debug(f"Logging in as {username}")
-                server.login(username, password)
-                logger.debug(f"Sending email to {recipient_email}")
-                server.send_message(msg)
-                logger.info(f"Email sent successfully to {recipient_email}")
+            # Reuse the pooled, already-authenticated SMTP session
+            logger.debug("Sending email to %s", recipient_email)
+            SMTPPool.get(server_addr, port, username, password).send(msg)
+            logger.info("Email sent successfully to %s", recipient_email)
             
             return True
         except Exception as e:
-            logger.error(f"Failed to send email to candidate: {e}")
+            logger.error("Failed to send email to candidate: %s", e)
             return False
     
     def get_context_summary(self) -> str:
@@ -414,3 +503,26 @@ def create_hr_agent(resume_data: Dict, job_description_text: str, candidate_emai
         hr_name=hr_name
     )
 
+
+async def bulk_process(agents: List[HRConversationalAgent], query: str, concurrency: int = 4,
+                       **smtp_kwargs) -> List:
+    """
+    Run the same query against many candidate agents concurrently.
+    
+    Args:
+        agents: HR agents, typically one per candidate
+        query: The HR's question or instruction sent to every agent
+        concurrency: Maximum number of in-flight LLM calls (provider rate limit)
+        **smtp_kwargs: Optional SMTP settings forwarded to achat()
+        
+    Returns:
+        One entry per agent, in order: the response text, or the exception
+        raised for that agent
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def _run(agent: HRConversationalAgent) -> str:
+        async with semaphore:
+            return await agent.achat(query, **smtp_kwargs)
+    
+    return await asyncio.gather(*(_run(agent) for agent in agents), return_exceptions=True)
@@ -4,66 +4,138 @@ Analyzes candidate resumes against job descriptions using LLM.
 Supports DeepSeek and Gemini models.
 """
 import json
+import random
 import re
-from typing import Dict, Optional
-from langchain_core.prompts import PromptTemplate
-from langchain_openai import ChatOpenAI
-from config import DEEPSEEK_API_KEY, GEMINI_API_KEY
+import string
+import time
+from typing import Dict, List, Optional, Tuple
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
 from utils.logger import get_logger, sanitize_error_message
+from utils.llm_cache import llm_cached
+from utils.json_parser import JSONObjectScanner, extract_json_object, loads as json_loads
+from agents._cache import LLM_CACHE_ENABLED
+from agents._llm import get_llm_model, _TRANSIENT_ERRORS
 
 logger = get_logger(__name__)
 
-# Try to import Gemini
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    logger.warning("langchain-google-genai not installed. Gemini support unavailable.")
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9][A-Za-z0-9._%+-]{2,}@[A-Za-z0-9][A-Za-z0-9.-]{1,}\.[A-Za-z]{2,}\b')
+_EMAIL_LOCAL_CHARS = frozenset(string.ascii_letters + string.digits + "._%+-")
+_EMAIL_DOMAIN_CHARS = frozenset(string.ascii_letters + string.digits + ".-")
+_EMAIL_PREFIX_RE = re.compile(r'(?i)(?:e-?mail|contact)\s*:\s*')
+_TRAILING_COMMA_RE = re.compile(r',\s*([}\]])')
+_PERCENT_RE = re.compile(r'(\d+(?:\.\d+)?)\s*%')
+# Attempts at streaming the analysis before a transient error is raised
+_STREAM_ATTEMPTS = 3
+# One pass finds every level/probability keyword; the first entry of the
+# priority tuple that was seen wins, as with one search per pattern. The
+# keywords sit in a lookahead so no match consumes text another keyword
+# starts in ("Mid-senior" registers both MidLevel and Senior); each one
+# starts with a different letter, so one position never matches two groups
+_LEVEL_SCANNER = re.compile(
+    r'(?=(?P<Executive>[Ee]xecutive)'
+    r'|(?P<Lead>[Ll]ead(?:er)?)'
+    r'|(?P<Senior>[Ss]enior(?!\s+level))'
+    r'|(?P<MidLevel>[Mm]id[- ]?(?:level|senior))'
+    r'|(?P<Junior>[Jj]unior))'
+)
+# Most specific level first, so a "Senior" mention does not mask "Executive"
+_LEVEL_PRIORITY = (
+    ("Executive", "Executive"),
+    ("Lead", "Lead"),
+    ("Senior", "Senior"),
+    ("MidLevel", "Mid-level"),
+    ("Junior", "Junior")
+)
+_PROB_SCANNER = re.compile(r'(?P<High>[Hh]igh)|(?P<Medium>[Mm]edium)|(?P<Low>[Ll]ow)')
+_PROB_PRIORITY = (("High", "High"), ("Medium", "Medium"), ("Low", "Low"))
 
+# Longest resume/job description text sent to the model, in characters
+MAX_PROMPT_INPUT_CHARS = 12000
+_WHITESPACE_RE = re.compile(r'\s+')
+# Raw response kept in detailed_analysis when the JSON could not be parsed
+MAX_FALLBACK_ANALYSIS_CHARS = 2048
 
-def get_llm_model():
+# Static instructions go first as the system message so every request shares
+# the same prefix, which providers can serve from their prompt prefix cache
+RESUME_SYSTEM = (
+    "You are an expert HR recruiter analyzing a candidate's resume against a job description.\n\n"
+    "Analyze the candidate and provide a comprehensive assessment. Consider:\n"
+    "1. Skills match (technical and soft skills)\n"
+    "2. Experience relevance\n"
+    "3. Education requirements\n"
+    "4. Years of experience and career progression\n"
+    "5. Past companies and tenure (how long they stayed at each company)\n"
+    "6. Likelihood of accepting an offer based on:\n"
+    "   - Current/previous company prestige and size\n"
+    "   - Time served at each company (stability indicators)\n"
+    "   - Career trajectory\n\n"
+    "Provide your response in the following JSON format:\n"
+    "{{\n"
+    '  "match_percentage": <number between 0 and 100>,\n'
+    '  "position_level": "<Junior/Mid-level/Senior/Lead/Executive>",\n'
+    '  "acceptance_probability": "<High/Medium/Low>",\n'
+    '  "acceptance_reasoning": "<brief explanation based on past companies and tenure>",\n'
+    '  "key_strengths": ["<strength1>", "<strength2>", ...],\n'
+    '  "key_gaps": ["<gap1>", "<gap2>", ...],\n'
+    '  "detailed_analysis": "<comprehensive analysis explaining the match percentage and fit>",\n'
+    '  "recommendation": "<recommendation for next steps>"\n'
+    "}}\n\n"
+    "Be specific and detailed in your analysis. Focus on quantifiable matches and gaps."
+)
+
+_RESUME_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", RESUME_SYSTEM),
+    ("user", "RESUME:\n{resume}\n\nJOB DESCRIPTION:\n{job_description}")
+])
+
+
+def _trim_for_llm(text: str, max_chars: int = MAX_PROMPT_INPUT_CHARS) -> str:
     """
-    Get an available LLM model (Gemini or DeepSeek).
-    Prefers Gemini if both are available.
-    
-    Returns:
-        LLM model instance
-        
-    Raises:
-        ValueError: If no API keys are available
+    Shrink extracted document text before it goes into a prompt.
+
+    Collapses whitespace within lines, drops blank and repeated lines
+    (headers, footers, duplicated skills sections) and truncates to max_chars.
     """
-    # Try Gemini first
-    if GEMINI_AVAILABLE and GEMINI_API_KEY:
-        try:
-            # Use environment variable instead of passing key directly
-            # This prevents API key exposure in error messages
-            model = ChatGoogleGenerativeAI(
-                model="models/gemini-2.5-flash",
-                temperature=0.3
-            )
-            logger.info("Using Gemini model")
-            return model
-        except Exception as e:
-            # Sanitize error message to prevent API key exposure
-            error_msg = sanitize_error_message(str(e))
-            logger.warning(f"Failed to initialize Gemini: {error_msg}")
-    
-    # Try DeepSeek as fallback if Gemini is not available
-    if DEEPSEEK_API_KEY:
-        try:
-            model = ChatOpenAI(
-                base_url="https://api.deepseek.com/v1",
-                model="deepseek-chat",
-                temperature=0.3,
-                openai_api_key=DEEPSEEK_API_KEY
-            )
-            logger.info("Using DeepSeek model (fallback)")
-            return model
-        except Exception as e:
-            logger.warning(f"Failed to initialize DeepSeek: {e}")
-    
-    raise ValueError("No available LLM API keys found. Please set GEMINI_API_KEY or DEEPSEEK_API_KEY in .env file")
+    lines = (_WHITESPACE_RE.sub(' ', line).strip() for line in text.splitlines())
+    trimmed = "\n".join(dict.fromkeys(line for line in lines if line))
+    if len(trimmed) > max_chars:
+        trimmed = trimmed[:max_chars].rstrip() + "..."
+    return trimmed
+
+
+def _build_resume_prompt(resume_text: str, job_description_text: str) -> List[BaseMessage]:
+    return _RESUME_PROMPT.format_messages(
+        resume=_trim_for_llm(resume_text),
+        job_description=_trim_for_llm(job_description_text)
+    )
+
+
+def _email_around(text: str, at: int) -> Optional[str]:
+    """
+    Walk outwards from the '@' at index ``at`` and return the address if it
+    is exactly what _EMAIL_RE would match there, else None.
+    """
+    lo = at
+    while lo > 0 and text[lo - 1] in _EMAIL_LOCAL_CHARS:
+        lo -= 1
+    hi = at + 1
+    end = len(text)
+    while hi < end and text[hi] in _EMAIL_DOMAIN_CHARS:
+        hi += 1
+    # Leading/trailing punctuation ("...mail.me@x.com.") is not part of it
+    while lo < at and not text[lo].isalnum():
+        lo += 1
+    while hi > at + 1 and not text[hi - 1].isalpha():
+        hi -= 1
+
+    # Same word-boundary rules as the regex: no word character either side
+    if lo > 0 and (text[lo - 1].isalnum() or text[lo - 1] == '_'):
+        return None
+    if hi < end and (text[hi].isalnum() or text[hi] == '_'):
+        return None
+    candidate = text[lo:hi]
+    return candidate if _EMAIL_RE.fullmatch(candidate) else None
 
 
 def extract_email_from_text(text: str) -> Optional[str]:
@@ -77,51 +149,30 @@ def extract_email_from_text(text: str) -> Optional[str]:
     Returns:
         Email address if found, None otherwise
     """
+    # Cheap prefilter: most text chunks contain no address at all
+    if '@' not in text:
+        return None
+    
     # Clean text - remove common prefixes that might cause issues
-    text = text.replace('Email:', '').replace('email:', '').replace('E-mail:', '')
-    text = text.replace('Contact:', '').replace('contact:', '')
+    text = _EMAIL_PREFIX_RE.sub(' ', text, count=5)
     
-    # More precise pattern: email must be preceded by whitespace, punctuation, or start of line
-    # and followed by whitespace, punctuation, or end of line
-    # This prevents matching "pe" + "diyakhetarpal@gmail.com" as "pediyakhetarpal@gmail.com"
-    email_pattern = r'(?:^|[\s\n\r\t,;:()\[\]{}"\'<>])([A-Za-z0-9][A-Za-z0-9._%+-]{2,}@[A-Za-z0-9][A-Za-z0-9.-]{1,}\.[A-Z|a-z]{2,})(?:[\s\n\r\t,;:()\[\]{}"\'<>]|$)'
+    # Common case: a single '@'; read the address around it directly
+    at = text.find('@')
+    if text.find('@', at + 1) == -1:
+        candidate = _email_around(text, at)
+        if candidate is not None:
+            return candidate
     
-    matches = re.findall(email_pattern, text)
+    # Word boundaries keep the match from starting or ending mid-word
+    matches = _EMAIL_RE.findall(text)
     if matches:
         # Return the longest match (most likely to be complete)
-        return max(matches, key=len).strip()
-    
-    # Fallback: simpler pattern but with validation
-    email_pattern_simple = r'\b[A-Za-z0-9][A-Za-z0-9._%+-]{2,}@[A-Za-z0-9][A-Za-z0-9.-]{1,}\.[A-Z|a-z]{2,}\b'
-    matches_simple = re.findall(email_pattern_simple, text)
-    
-    if matches_simple:
-        # Filter and validate emails
-        valid_emails = []
-        for match in matches_simple:
-            # Basic validation: email should have reasonable structure
-            parts = match.split('@')
-            if len(parts) == 2:
-                local, domain = parts
-                # Local part should be at least 2 chars, domain should have at least one dot
-                if len(local) >= 2 and '.' in domain and len(domain.split('.')[-1]) >= 2:
-                    # Check if email is not part of a larger word
-                    email_start = text.find(match)
-                    if email_start >= 0:
-                        char_before = text[email_start - 1] if email_start > 0 else ' '
-                        char_after = text[email_start + len(match)] if email_start + len(match) < len(text) else ' '
-                        # Should be surrounded by non-alphanumeric characters (except @ and .)
-                        if not (char_before.isalnum() and char_before not in '@.') and \
-                           not (char_after.isalnum() and char_after not in '@.'):
-                            valid_emails.append(match)
-        
-        if valid_emails:
-            # Return the longest valid email
-            return max(valid_emails, key=len)
+        return max(matches, key=len)
     
     return None
 
 
+@llm_cached(ttl=86400)
 def analyze_resume(resume_text: str, job_description_text: str) -> Dict:
     """
     Analyze a candidate resume against a job description.
@@ -141,86 +192,165 @@ def analyze_resume(resume_text: str, job_description_text: str) -> Dict:
     # Extract email from resume
     email = extract_email_from_text(resume_text)
     
-    # Create prompt for LLM analysis
-    prompt_template = PromptTemplate(
-        input_variables=["resume", "job_description"],
-        template=(
-            "You are an expert HR recruiter analyzing a candidate's resume against a job description.\n\n"
-            "RESUME:\n{resume}\n\n"
-            "JOB DESCRIPTION:\n{job_description}\n\n"
-            "Analyze the candidate and provide a comprehensive assessment. Consider:\n"
-            "1. Skills match (technical and soft skills)\n"
-            "2. Experience relevance\n"
-            "3. Education requirements\n"
-            "4. Years of experience and career progression\n"
-            "5. Past companies and tenure (how long they stayed at each company)\n"
-            "6. Likelihood of accepting an offer based on:\n"
-            "   - Current/previous company prestige and size\n"
-            "   - Time served at each company (stability indicators)\n"
-            "   - Career trajectory\n\n"
-            "Provide your response in the following JSON format:\n"
-            "{{\n"
-            '  "match_percentage": <number between 0 and 100>,\n'
-            '  "position_level": "<Junior/Mid-level/Senior/Lead/Executive>",\n'
-            '  "acceptance_probability": "<High/Medium/Low>",\n'
-            '  "acceptance_reasoning": "<brief explanation based on past companies and tenure>",\n'
-            '  "key_strengths": ["<strength1>", "<strength2>", ...],\n'
-            '  "key_gaps": ["<gap1>", "<gap2>", ...],\n'
-            '  "detailed_analysis": "<comprehensive analysis explaining the match percentage and fit>",\n'
-            '  "recommendation": "<recommendation for next steps>"\n'
-            "}}\n\n"
-            "Be specific and detailed in your analysis. Focus on quantifiable matches and gaps."
-        )
-    )
+    prompt = _build_resume_prompt(resume_text, job_description_text)
     
-    prompt = prompt_template.format(
-        resume=resume_text,
-        job_description=job_description_text
-    )
+    try:
+        model = get_llm_model(temperature=0.0)
+        if LLM_CACHE_ENABLED:
+            # Streaming bypasses the persistent response cache (and the model's
+            # retry policy), so with the cache on a repeat prompt is free
+            response = model.invoke(prompt)
+            response_text = response.content if hasattr(response, "content") else str(response)
+        else:
+            response_text = _stream_analysis(model, prompt)
+        return _parse_analysis(response_text, email)
+        
+    except Exception as e:
+        # Sanitize error message to prevent API key exposure
+        error_msg = sanitize_error_message(str(e))
+        logger.error("Error during resume analysis: %s", error_msg)
+        raise ValueError(f"Failed to analyze resume: {error_msg}")
+
+
+def _stream_analysis(model, prompt: List[BaseMessage]) -> str:
+    """
+    Stream the analysis and stop reading once the JSON object is complete.
+
+    The model's with_retry() policy does not cover stream(), so transient
+    errors restart the stream here (3 attempts, exponential backoff).
+
+    Returns:
+        The text received, ending at the object's closing brace if one was found
+    """
+    for attempt in range(_STREAM_ATTEMPTS):
+        scanner = JSONObjectScanner()
+        try:
+            for chunk in model.stream(prompt):
+                json_str = scanner.feed(chunk.content if hasattr(chunk, "content") else str(chunk))
+                if json_str is not None:
+                    # Leaving the loop closes the stream; trailing commentary is never read
+                    return json_str
+            return scanner.text
+        except _TRANSIENT_ERRORS as e:
+            if attempt == _STREAM_ATTEMPTS - 1:
+                raise
+            logger.warning("Resume analysis stream failed (%s), retrying", sanitize_error_message(str(e)))
+            time.sleep(2 ** attempt + random.random())
+
+
+async def aanalyze_resume(resume_text: str, job_description_text: str) -> Dict:
+    """
+    Async version of analyze_resume(); awaits the model instead of blocking.
+
+    Raises:
+        ValueError: If the analysis fails
+    """
+    email = extract_email_from_text(resume_text)
+    prompt = _build_resume_prompt(resume_text, job_description_text)
     
     try:
-        model = get_llm_model()
-        response = model.invoke(prompt)
+        model = get_llm_model(temperature=0.0)
+        response = await model.ainvoke(prompt)
         response_text = response.content if hasattr(response, "content") else str(response)
+        return _parse_analysis(response_text, email)
         
-        # Try to extract JSON from response
-        # Look for JSON block in the response
-        json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-        if json_match:
-            json_str = json_match.group(0)
+    except Exception as e:
+        # Sanitize error message to prevent API key exposure
+        error_msg = sanitize_error_message(str(e))
+        logger.error("Error during resume analysis: %s", error_msg)
+        raise ValueError(f"Failed to analyze resume: {error_msg}")
+
+
+def analyze_resumes(pairs: List[Tuple[str, str]]) -> List[Dict]:
+    """
+    Analyze several (resume_text, job_description_text) pairs at once.
+
+    Resumes are too long to pack several into one prompt, so the prompts are
+    sent through the model's native batch interface, which issues them in
+    parallel over the shared client.
+
+    Args:
+        pairs: (resume_text, job_description_text) tuples
+
+    Returns:
+        Analysis dictionaries (see analyze_resume) in the same order as pairs
+
+    Raises:
+        ValueError: If an analysis fails even when retried on its own
+    """
+    if not pairs:
+        return []
+
+    prompts = [
+        _build_resume_prompt(resume_text, job_description_text)
+        for resume_text, job_description_text in pairs
+    ]
+    model = get_llm_model(temperature=0.0)
+    responses = model.batch(prompts, return_exceptions=True)
+
+    results = []
+    for (resume_text, job_description_text), response in zip(pairs, responses):
+        if isinstance(response, Exception):
+            # Retry this pair alone; analyze_resume raises a sanitized ValueError
+            logger.warning("Batched resume analysis failed, retrying individually")
+            results.append(analyze_resume(resume_text, job_description_text))
+            continue
+        response_text = response.content if hasattr(response, "content") else str(response)
+        results.append(_parse_analysis(response_text, extract_email_from_text(resume_text)))
+    return results
+
+
+def _parse_analysis(response_text: str, email: Optional[str]) -> Dict:
+    """Turn a raw analysis response into the result dict returned by analyze_resume."""
+    # Try to extract JSON from response
+    # First balanced top-level object; braces inside strings are ignored
+    json_str = extract_json_object(response_text)
+    if json_str:
+        try:
+            analysis_result = json_loads(json_str)
+        except json.JSONDecodeError:
             try:
-                analysis_result = json.loads(json_str)
+                # Models often leave a trailing comma before } or ]
+                analysis_result = json_loads(_TRAILING_COMMA_RE.sub(r'\1', json_str))
             except json.JSONDecodeError:
                 # If JSON parsing fails, try to extract key information manually
                 logger.warning("Failed to parse JSON response, extracting manually")
                 analysis_result = extract_analysis_manually(response_text)
-        else:
-            # If no JSON found, extract manually
-            logger.warning("No JSON found in response, extracting manually")
-            analysis_result = extract_analysis_manually(response_text)
-        
-        # Add email to result
-        analysis_result["email"] = email
-        
-        # Ensure match_percentage is a number
-        if "match_percentage" in analysis_result:
-            try:
-                analysis_result["match_percentage"] = float(analysis_result["match_percentage"])
-            except (ValueError, TypeError):
-                # Try to extract percentage from text
-                percentage_match = re.search(r'(\d+(?:\.\d+)?)\s*%', str(analysis_result.get("match_percentage", "")))
-                if percentage_match:
-                    analysis_result["match_percentage"] = float(percentage_match.group(1))
-                else:
-                    analysis_result["match_percentage"] = 0.0
-        
-        return analysis_result
-        
-    except Exception as e:
-        # Sanitize error message to prevent API key exposure
-        error_msg = sanitize_error_message(str(e))
-        logger.error(f"Error during resume analysis: {error_msg}")
-        raise ValueError(f"Failed to analyze resume: {error_msg}")
+    else:
+        # If no JSON found, extract manually
+        logger.warning("No JSON found in response, extracting manually")
+        analysis_result = extract_analysis_manually(response_text)
+    
+    # Add email to result
+    analysis_result["email"] = email
+    
+    # Ensure match_percentage is a number
+    if "match_percentage" in analysis_result:
+        try:
+            analysis_result["match_percentage"] = float(analysis_result["match_percentage"])
+        except (ValueError, TypeError):
+            # Try to extract percentage from text
+            percentage_match = _PERCENT_RE.search(str(analysis_result.get("match_percentage", "")))
+            if percentage_match:
+                analysis_result["match_percentage"] = float(percentage_match.group(1))
+            else:
+                analysis_result["match_percentage"] = 0.0
+    
+    return analysis_result
+
+
+def _scan_keywords(scanner, priority: tuple, text: str) -> Optional[str]:
+    """Return the highest-priority label whose keyword occurs in text."""
+    seen = set()
+    best = priority[0][0]
+    for match in scanner.finditer(text):
+        seen.add(match.lastgroup)
+        if match.lastgroup == best:
+            break  # nothing can outrank the top label
+    for group, label in priority:
+        if group in seen:
+            return label
+    return None
 
 
 def extract_analysis_manually(response_text: str) -> Dict:
@@ -240,35 +370,23 @@ def extract_analysis_manually(response_text: str) -> Dict:
         "acceptance_reasoning": "",
         "key_strengths": [],
         "key_gaps": [],
-        "detailed_analysis": response_text,
+        # Only shown for diagnostics, so keep the returned dict small
+        "detailed_analysis": response_text[:MAX_FALLBACK_ANALYSIS_CHARS],
         "recommendation": ""
     }
     
     # Try to extract percentage
-    percentage_match = re.search(r'(\d+(?:\.\d+)?)\s*%', response_text)
+    percentage_match = _PERCENT_RE.search(response_text)
     if percentage_match:
         result["match_percentage"] = float(percentage_match.group(1))
     
-    # Try to extract position level
-    level_patterns = {
-        "Junior": r'[Jj]unior',
-        "Mid-level": r'[Mm]id[- ]?level|[Mm]id[- ]?senior',
-        "Senior": r'[Ss]enior(?!\s+level)',
-        "Lead": r'[Ll]ead|[Ll]eader',
-        "Executive": r'[Ee]xecutive'
-    }
-    for level, pattern in level_patterns.items():
-        if re.search(pattern, response_text):
-            result["position_level"] = level
-            break
-    
-    # Try to extract acceptance probability
-    if re.search(r'[Hh]igh', response_text):
-        result["acceptance_probability"] = "High"
-    elif re.search(r'[Mm]edium', response_text):
-        result["acceptance_probability"] = "Medium"
-    elif re.search(r'[Ll]ow', response_text):
-        result["acceptance_probability"] = "Low"
+    # Try to extract position level and acceptance probability
+    level = _scan_keywords(_LEVEL_SCANNER, _LEVEL_PRIORITY, response_text)
+    if level:
+        result["position_level"] = level
+    probability = _scan_keywords(_PROB_SCANNER, _PROB_PRIORITY, response_text)
+    if probability:
+        result["acceptance_probability"] = probability
     
     return result
 
@@ -285,11 +403,11 @@ def analyze_resume_from_files(resume_file_path: str, job_description_file_path:
     Returns:
         Dictionary with analysis results
     """
-    from utils.file_extractor import extract_text_from_file
+    from utils.file_extractor import extract_text_from_file_cached
     
-    # Extract text from files
-    resume_text = extract_text_from_file(resume_file_path)
-    job_description_text = extract_text_from_file(job_description_file_path)
+    # Extract text from files (unchanged files are not parsed again)
+    resume_text = extract_text_from_file_cached(resume_file_path)
+    job_description_text = extract_text_from_file_cached(job_description_file_path)
     
     # Analyze
     return analyze_resume(resume_text, job_description_text)
@@ -1,65 +1,156 @@
-from langchain_core.prompts import PromptTemplate
-from config import GEMINI_API_KEY, DEEPSEEK_API_KEY  # Import API keys from config
+import asyncio
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+from langchain_core.messages import BaseMessage
+from langchain_core.prompts import ChatPromptTemplate
 from utils.formatter import clean_text
-from utils.logger import get_logger, sanitize_error_message
+from utils.logger import get_logger
+from utils.llm_cache import llm_cached
+from agents._llm import get_llm_model
 
 logger = get_logger(__name__)
 
-# Try to import Gemini
-try:
-    from langchain_google_genai import ChatGoogleGenerativeAI
-    GEMINI_AVAILABLE = True
-except ImportError:
-    GEMINI_AVAILABLE = False
-    logger.warning("langchain-google-genai not installed. Gemini support unavailable.")
+# Input budget per packed prompt; summary quality drops on much longer prompts
+MAX_BATCH_TOKENS = 4000
+# Rough chars-per-token ratio used to size batches without a tokenizer
+_CHARS_PER_TOKEN = 4
 
+_JSON_ARRAY_RE = re.compile(r'\[.*\]', re.DOTALL)
 
+SUMMARIZE_SYSTEM = "Summarize the following email content in 2 to 3 sentences."
 
+# Stable system prefix, so providers can reuse their prompt prefix cache
+_SUMMARY_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", SUMMARIZE_SYSTEM),
+    ("user", "{content}")
+])
+
+
+def _build_summary_prompt(email: dict) -> List[BaseMessage]:
+    return _SUMMARY_PROMPT.format_messages(content=email.get("body", ""))
+
+
+@llm_cached(ttl=86400, key=lambda email: email.get("body", ""))
 def summarize_email(email: dict) -> str:
     """
     Uses an LLM to generate a concise summary of the email content.
     """
-    prompt_template = PromptTemplate(
-        input_var=["content"],
-        template="Summarize the following email content in 2 to 3 sentences: {content}"
-    )
-    
-    prompt = prompt_template.format(content=email.get("body", ""))
+    prompt = _build_summary_prompt(email)
     
-    # Try Gemini first, then DeepSeek as fallback
-    model = None
-    if GEMINI_AVAILABLE and GEMINI_API_KEY:
-        try:
-            # Use environment variable instead of passing key directly
-            # This prevents API key exposure in error messages
-            model = ChatGoogleGenerativeAI(
-                model="models/gemini-2.5-flash",
-                temperature=0.3
-            )
-            logger.debug("Using Gemini model for email summarization")
-        except Exception as e:
-            # Sanitize error message to prevent API key exposure
-            error_msg = sanitize_error_message(str(e))
-            logger.warning(f"Failed to initialize Gemini: {error_msg}")
-    
-    if model is None and DEEPSEEK_API_KEY:
-        try:
-            from langchain_openai import ChatOpenAI
-            model = ChatOpenAI(
-                base_url="https://api.deepseek.com/v1",
-                model="deepseek-chat",
-                temperature=0.3,
-                openai_api_key=DEEPSEEK_API_KEY
-            )
-            logger.debug("Using DeepSeek model for email summarization (fallback)")
-        except Exception as e:
-            logger.warning(f"Failed to initialize DeepSeek: {e}")
-    
-    if model is None:
-        raise ValueError("No available LLM API keys found. Please set GEMINI_API_KEY or DEEPSEEK_API_KEY in .env file")
+    # Shared, memoized client (Gemini first, DeepSeek as fallback)
+    model = get_llm_model(temperature=0.0)
     
     summary = model.invoke(prompt)
     summary_text = summary.content if hasattr(summary, "content") else str(summary)
     
     
-    return clean_text(summary_text)
\ No newline at end of file
+    return clean_text(summary_text)
+
+
+async def asummarize_email(email: dict) -> str:
+    """
+    Async version of summarize_email().
+    """
+    model = get_llm_model(temperature=0.0)
+    summary = await model.ainvoke(_build_summary_prompt(email))
+    summary_text = summary.content if hasattr(summary, "content") else str(summary)
+    return clean_text(summary_text)
+
+
+async def summarize_emails_async(emails: List[dict], concurrency: int = 16) -> List[str]:
+    """
+    Summarize emails one prompt each, with up to ``concurrency`` calls in flight.
+
+    Arguments:
+        emails (list): Emails to summarize. Expected key: "body".
+        concurrency (int): Maximum number of simultaneous LLM calls.
+
+    Returns:
+        list: Summaries in the same order as ``emails``.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _summarize(email: dict) -> str:
+        async with semaphore:
+            return await asummarize_email(email)
+
+    return list(await asyncio.gather(*(_summarize(email) for email in emails)))
+
+
+def summarize_emails_parallel(emails: List[dict], max_workers: int = 16) -> List[str]:
+    """
+    Thread-pool variant of summarize_emails_async() for synchronous callers.
+
+    Returns:
+        list: Summaries in the same order as ``emails``.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(summarize_email, emails))
+
+
+def _pack_batches(emails: List[dict], max_tokens: int) -> List[List[dict]]:
+    """Group emails so each packed prompt stays under max_tokens (estimated)."""
+    batches, current, current_tokens = [], [], 0
+    for email in emails:
+        tokens = len(email.get("body", "")) // _CHARS_PER_TOKEN + 1
+        if current and current_tokens + tokens > max_tokens:
+            batches.append(current)
+            current, current_tokens = [], 0
+        current.append(email)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+
+def _parse_summaries(response_text: str, expected: int) -> Optional[List[str]]:
+    """Parse the JSON summary array; None if it is missing or the wrong length."""
+    match = _JSON_ARRAY_RE.search(response_text)
+    if not match:
+        return None
+    try:
+        summaries = json.loads(match.group(0))
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(summaries, list) or len(summaries) != expected:
+        return None
+    return [clean_text(str(summary)) for summary in summaries]
+
+
+def summarize_emails(emails: List[dict], max_batch_tokens: int = MAX_BATCH_TOKENS) -> List[str]:
+    """
+    Summarize many emails, packing several into each LLM call.
+
+    Batch size adapts to the email lengths so every prompt stays within
+    max_batch_tokens; a batch whose output cannot be parsed is summarized
+    one email at a time instead.
+
+    Arguments:
+        emails (list): Emails to summarize. Expected key: "body".
+        max_batch_tokens (int): Approximate input token budget per prompt.
+
+    Returns:
+        list: Summaries in the same order as ``emails``.
+    """
+    model = get_llm_model(temperature=0.0)
+    results = []
+    for batch in _pack_batches(emails, max_batch_tokens):
+        if len(batch) == 1:
+            results.append(summarize_email(batch[0]))
+            continue
+        sections = [f"[EMAIL {i}]\n{email.get('body', '')}" for i, email in enumerate(batch, 1)]
+        prompt = (
+            "Summarize each email below in 2 to 3 sentences.\n"
+            "Return ONLY a JSON array of summary strings, one per email, in the same order.\n\n"
+            + "\n\n".join(sections)
+        )
+        response = model.invoke(prompt)
+        response_text = response.content if hasattr(response, "content") else str(response)
+        summaries = _parse_summaries(response_text, len(batch))
+        if summaries is None:
+            logger.warning("Failed to parse batch summaries, falling back to per-email calls")
+            summaries = [summarize_email(email) for email in batch]
+        results.extend(summaries)
+    return results
@@ -3,25 +3,21 @@ HR Workflow Automation - Streamlit Application
 A comprehensive HR tool for resume analysis, candidate evaluation, and email management.
 """
 import streamlit as st
-import os
-import tempfile
+import hashlib
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Dict, List, NamedTuple
 import json
 
-# Import project modules
-from agents import analyze_resume_from_files, create_hr_agent
-from core.email_imap import fetch_imap_emails
-from agents.summarization_agent import summarize_email
-from agents.email_writing_agent import generate_email_with_ai
-from core.email_sender import send_email
+# Import project modules (agents, IMAP and file parsing pull in LangChain,
+# provider SDKs and PDF libraries, so those are imported where first used)
 from config import (
     EMAIL_USERNAME, EMAIL_PASSWORD, EMAIL_SERVER, EMAIL_PORT,
     IMAP_USERNAME, IMAP_PASSWORD, IMAP_SERVER, IMAP_PORT,
-    ADMIN_USERNAME, ADMIN_PASSWORD, ADMIN_EMAIL
+    ADMIN_USERNAME, ADMIN_PASSWORD, ADMIN_EMAIL, GEMINI_CONTEXT_CACHE_TTL
 )
-from utils.file_extractor import extract_text_from_file
-from utils.email_helper import send_email_with_credentials
 
 # Page configuration
 st.set_page_config(
@@ -32,46 +28,18 @@ st.set_page_config(
 )
 
 # Custom CSS for better styling
-st.markdown("""
-    <style>
-    .main-header {
-        font-size: 3rem;
-        font-weight: bold;
-        text-align: center;
-        background: linear-gradient(90deg, #667eea 0%, #764ba2 100%);
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        margin-bottom: 2rem;
-    }
-    .metric-card {
-        background-color: #f0f2f6;
-        padding: 1rem;
-        border-radius: 0.5rem;
-        border-left: 4px solid #667eea;
-    }
-    .chat-message {
-        padding: 1rem;
-        border-radius: 0.5rem;
-        margin-bottom: 1rem;
-    }
-    .user-message {
-        background-color: #e3f2fd;
-        text-align: right;
-    }
-    .agent-message {
-        background-color: #f5f5f5;
-    }
-    .stButton>button {
-        width: 100%;
-        background-color: #667eea;
-        color: white;
-        font-weight: bold;
-    }
-    .stButton>button:hover {
-        background-color: #764ba2;
-    }
-    </style>
-""", unsafe_allow_html=True)
+@st.cache_resource
+def load_css() -> str:
+    """Read and minify the stylesheet once per server process"""
+    css = (Path(__file__).parent / "static" / "style.css").read_text(encoding="utf-8")
+    css = re.sub(r'\s*([{};,])\s*', r'\1', re.sub(r'\s+', ' ', css)).strip()
+    return f"<style>{css}</style>"
+
+
+# Must be emitted on every run: Streamlit drops elements a rerun does not
+# redraw, so a session_state gate would unstyle the page after one rerun.
+# st.html skips the markdown pass st.markdown would do on the client.
+st.html(load_css())
 
 # Initialize session state
 if 'authenticated' not in st.session_state:
@@ -80,6 +48,9 @@ if 'resume_analysis' not in st.session_state:
     st.session_state.resume_analysis = None
 if 'hr_agent' not in st.session_state:
     st.session_state.hr_agent = None
+if 'hr_agent_future' not in st.session_state:
+    # Pending HRConversationalAgent.fork() started right after analysis
+    st.session_state.hr_agent_future = None
 if 'job_description_text' not in st.session_state:
     st.session_state.job_description_text = None
 if 'chat_history' not in st.session_state:
@@ -101,6 +72,45 @@ if 'is_admin' not in st.session_state:
     st.session_state.is_admin = False
 if 'require_email_credentials' not in st.session_state:
     st.session_state.require_email_credentials = False
+if 'analysis_cache' not in st.session_state:
+    # (resume sha256, job description sha256) -> (job description text, analysis)
+    st.session_state.analysis_cache = {}
+if 'summary_cache' not in st.session_state:
+    # email sha256 (subject + body) -> summary
+    st.session_state.summary_cache = {}
+
+
+def _do_login():
+    """Login button callback; runs before the next script pass, so that pass
+    already renders the dashboard without an extra st.rerun()"""
+    username = st.session_state.login_username
+    password = st.session_state.login_password
+    if username and password:
+        # Check against admin credentials from .env
+        if ADMIN_USERNAME and ADMIN_PASSWORD and username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
+            # Admin login - use admin email credentials from .env
+            st.session_state.authenticated = True
+            st.session_state.hr_name = username
+            st.session_state.is_admin = True
+            st.session_state.email_credentials['username'] = ADMIN_EMAIL or EMAIL_USERNAME
+            st.session_state.email_credentials['password'] = EMAIL_PASSWORD
+            st.session_state.email_credentials['imap_username'] = ADMIN_EMAIL or EMAIL_USERNAME
+            st.session_state.email_credentials['imap_password'] = EMAIL_PASSWORD
+            st.success("✅ Admin access granted. Using admin email credentials.")
+        else:
+            # Non-admin login - require them to provide email credentials
+            st.session_state.authenticated = True
+            st.session_state.hr_name = username
+            st.session_state.is_admin = False
+            st.session_state.require_email_credentials = True
+            # Clear email credentials - user must provide their own
+            st.session_state.email_credentials['username'] = ''
+            st.session_state.email_credentials['password'] = ''
+            st.session_state.email_credentials['imap_username'] = ''
+            st.session_state.email_credentials['imap_password'] = ''
+            st.warning("⚠️ Your password doesn't match admin password. Change email and password in the sidebar to access email features (fetch, summarize, send email).")
+    else:
+        st.error("Please enter username and password")
 
 
 def login_page():
@@ -110,54 +120,471 @@ def login_page():
     col1, col2, col3 = st.columns([1, 2, 1])
     with col2:
         st.markdown("### 🔐 Login")
-        username = st.text_input("Username", key="login_username")
-        password = st.text_input("Password", type="password", key="login_password")
+        st.text_input("Username", key="login_username")
+        st.text_input("Password", type="password", key="login_password")
         
         # Authentication logic - check against .env credentials
-        if st.button("Login", type="primary"):
-            if username and password:
-                # Check against admin credentials from .env
-                if ADMIN_USERNAME and ADMIN_PASSWORD and username == ADMIN_USERNAME and password == ADMIN_PASSWORD:
-                    # Admin login - use admin email credentials from .env
-                    st.session_state.authenticated = True
-                    st.session_state.hr_name = username
-                    st.session_state.is_admin = True
-                    st.session_state.email_credentials['username'] = ADMIN_EMAIL or EMAIL_USERNAME
-                    st.session_state.email_credentials['password'] = EMAIL_PASSWORD
-                    st.session_state.email_credentials['imap_username'] = ADMIN_EMAIL or EMAIL_USERNAME
-                    st.session_state.email_credentials['imap_password'] = EMAIL_PASSWORD
-                    st.success("✅ Admin access granted. Using admin email credentials.")
-                    st.rerun()
-                else:
-                    # Non-admin login - require them to provide email credentials
-                    st.session_state.authenticated = True
-                    st.session_state.hr_name = username
-                    st.session_state.is_admin = False
-                    st.session_state.require_email_credentials = True
-                    # Clear email credentials - user must provide their own
-                    st.session_state.email_credentials['username'] = ''
-                    st.session_state.email_credentials['password'] = ''
-                    st.session_state.email_credentials['imap_username'] = ''
-                    st.session_state.email_credentials['imap_password'] = ''
-                    st.warning("⚠️ Your password doesn't match admin password. Change email and password in the sidebar to access email features (fetch, summarize, send email).")
-                    st.rerun()
-            else:
-                st.error("Please enter username and password")
+        st.button("Login", type="primary", on_click=_do_login)
         
         st.markdown("---")
         st.info("💡 Enter user credentials or dummy credentials to access the app")
 
 
-def save_uploaded_file(uploaded_file, file_type: str) -> Optional[str]:
-    """Save uploaded file to temporary location"""
-    if uploaded_file is not None:
-        # Get file extension
-        file_extension = Path(uploaded_file.name).suffix
-        # Create temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as tmp_file:
-            tmp_file.write(uploaded_file.getbuffer())
-            return tmp_file.name
-    return None
+def file_digest(uploaded_file) -> str:
+    """SHA-256 of an uploaded file's contents"""
+    return hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+
+
+def email_digest(email: Dict) -> str:
+    """SHA-256 of an email's subject and body"""
+    hasher = hashlib.sha256()
+    hasher.update((email.get('subject') or '').encode('utf-8', 'surrogatepass'))
+    hasher.update(b'\x00')
+    hasher.update((email.get('body') or '').encode('utf-8', 'surrogatepass'))
+    return hasher.hexdigest()
+
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def extract_uploaded_text(file_bytes: bytes, suffix: str) -> str:
+    """Extract text from an uploaded file's bytes; cached by content across reruns"""
+    from utils.file_extractor import extract_text_from_bytes
+    return extract_text_from_bytes(file_bytes, suffix)
+
+
+class CredentialsState(NamedTuple):
+    """Which email features the current user can use"""
+    is_admin: bool
+    has_imap: bool
+    smtp_ready: bool
+
+
+def credentials_state() -> CredentialsState:
+    """Evaluate the credential checks once per run, after the sidebar inputs"""
+    credentials = st.session_state.email_credentials
+    return CredentialsState(
+        is_admin=st.session_state.get('is_admin', False),
+        has_imap=bool(credentials.get('imap_username') and credentials.get('imap_password')),
+        smtp_ready=bool(credentials.get('username') and credentials.get('password'))
+    )
+
+
+def imap_pool_key(credentials: Dict, imap_port: int) -> str:
+    """SHA-256 identifying one IMAP account/server in the connection pool"""
+    hasher = hashlib.sha256()
+    for part in (credentials['imap_username'], credentials['imap_password'],
+                 credentials['imap_server'], str(imap_port)):
+        hasher.update((part or '').encode('utf-8', 'surrogatepass'))
+        hasher.update(b'\x00')
+    return hasher.hexdigest()
+
+
+def close_imap_pool():
+    """Log out every pooled IMAP connection of this session and forget its fetched emails"""
+    for conn in st.session_state.get('imap_pool', {}).values():
+        try:
+            conn.logout()
+        except Exception:
+            pass
+    st.session_state.imap_pool = {}
+    st.session_state.imap_email_cache = {}
+
+
+def _fetch_worker(job: Dict, pool: Dict, email_cache: Dict, credentials: Dict,
+                  max_emails: int, imap_port: int):
+    """Background IMAP fetch; reports back only through the job dict"""
+    key = imap_pool_key(credentials, imap_port)
+    conn = None
+    try:
+        from core.email_imap import connect_imap, fetch_imap_emails
+        
+        # Reuse this session's logged-in connection if it is still alive,
+        # skipping the TLS handshake and LOGIN
+        conn = pool.pop(key, None)
+        if conn is not None:
+            try:
+                conn.noop()
+            except Exception:
+                conn = None
+        if conn is None:
+            conn = connect_imap(
+                credentials['imap_username'],
+                credentials['imap_password'],
+                credentials['imap_server'],
+                imap_port
+            )
+        
+        job['emails'] = fetch_imap_emails(
+            username=credentials['imap_username'],
+            password=credentials['imap_password'],
+            imap_server=credentials['imap_server'],
+            max_emails=max_emails,
+            port=imap_port,
+            bulk=True,
+            progress_callback=lambda done, total: job.update(progress=done / total),
+            mail=conn,
+            # Parsed emails by UID: reruns only download mail that arrived since
+            cache=email_cache.setdefault(key, {})
+        )
+        # Only a connection that just worked goes back into the pool
+        pool[key] = conn
+    except Exception as e:
+        job['error'] = str(e)
+        if conn is not None:
+            try:
+                conn.logout()
+            except Exception:
+                pass
+    finally:
+        job['status'] = 'done'
+
+
+def email_fetch_fragment(creds: CredentialsState):
+    """Fetch tab as a fragment, polling once a second while a background fetch runs"""
+    job = st.session_state.get('fetch_job')
+    polling = job is not None and job['status'] == 'running'
+    # run_every is fixed when the fragment is registered on a full run, so the
+    # tab switches polling on/off with one full rerun when a fetch starts/ends
+    st.fragment(_email_fetch_tab, run_every=1 if polling else None)(creds, polling)
+
+
+def _email_fetch_tab(creds: CredentialsState, polling: bool):
+    """Fetch tab; reruns on its own so the rest of the app stays responsive while IMAP runs"""
+    job = st.session_state.get('fetch_job')
+    if polling and (job is None or job['status'] != 'running'):
+        # Fetch finished: show the result from a full run that stops the polling
+        st.rerun()
+    
+    st.markdown("#### Fetch and View Emails")
+    
+    # Check if user has configured email credentials
+    if not creds.is_admin and not creds.has_imap:
+        st.error("❌ Please configure your email credentials in the sidebar to fetch emails.")
+        st.info("📝 Go to the sidebar → Email Settings → Configure your IMAP credentials")
+    else:
+        # Add option to limit number of emails
+        max_emails_to_fetch = st.number_input(
+            "Maximum emails to fetch:",
+            min_value=10,
+            max_value=100,
+            value=50,
+            step=10,
+            help="Limiting the number helps prevent connection timeouts"
+        )
+        
+        running = job is not None and job['status'] == 'running'
+        if st.button("🔄 Fetch Emails", type="primary", disabled=running):
+            # For non-admin, must have credentials configured
+            if not creds.is_admin and not creds.has_imap:
+                st.error("❌ Please configure your email credentials in the sidebar first.")
+            elif creds.has_imap:
+                # Get IMAP port from credentials or use default
+                imap_port = 993  # Default SSL port
+                if 'imap_port' in st.session_state.email_credentials:
+                    try:
+                        imap_port = int(st.session_state.email_credentials.get('imap_port', 993))
+                    except (ValueError, TypeError):
+                        imap_port = 993
+                
+                # The worker thread has no Streamlit context, so it gets plain copies
+                # of what it needs and writes its result into a plain dict
+                job = {'status': 'running', 'progress': 0.0, 'emails': None, 'error': None,
+                       'max_emails': max_emails_to_fetch}
+                st.session_state.fetch_job = job
+                threading.Thread(
+                    target=_fetch_worker,
+                    args=(job, st.session_state.setdefault('imap_pool', {}),
+                          st.session_state.setdefault('imap_email_cache', {}),
+                          dict(st.session_state.email_credentials), max_emails_to_fetch, imap_port),
+                    daemon=True
+                ).start()
+                # Re-register the fragment with polling on
+                st.rerun()
+            else:
+                st.warning("⚠️ Please configure IMAP credentials in the sidebar")
+        
+        if job is not None and job['status'] == 'running':
+            st.info(f"Fetching up to {job['max_emails']} emails... This may take a moment.")
+            st.progress(job['progress'])
+        elif job is not None:
+            st.session_state.fetch_job = None
+            if job['error']:
+                st.error(f"❌ Error fetching emails: {job['error']}")
+                
+                # Provide helpful troubleshooting tips
+                with st.expander("🔧 Troubleshooting Tips"):
+                    st.markdown("""
+                **Common issues and solutions:**
+                1. **Connection timeout**: Try reducing the maximum emails to fetch
+                2. **Authentication error**: Verify your IMAP app password is correct
+                3. **Server error**: Check if IMAP is enabled in your email account settings
+                4. **Network issue**: Check your internet connection
+                5. **Gmail users**: Make sure "Less secure app access" is enabled or use an App Password
+                
+                **For Gmail:**
+                - Enable 2-Step Verification
+                - Generate an App Password from Google Account settings
+                - Use the App Password (16 characters) instead of your regular password
+                """)
+            elif job['emails']:
+                # emails are returned in reverse order (newest first)
+                # Take first N emails (newest first)
+                # Truncate once here instead of on every rerun of the listing; the
+                # full body is kept because the Summarize tab needs it
+                st.session_state.fetched_emails = [
+                    {**e,
+                     'body_preview': (e.get('body') or '')[:500],
+                     'body_truncated': len(e.get('body') or '') > 500}
+                    for e in job['emails'][:job['max_emails']]
+                ]
+                # Summarize tab labels, built once per fetch rather than per rerun
+                st.session_state.email_options = {
+                    f"{e.get('subject', 'No Subject')} - {e.get('from', 'Unknown')}": idx
+                    for idx, e in enumerate(st.session_state.fetched_emails)
+                }
+                st.success(f"✅ Successfully fetched {len(st.session_state.fetched_emails)} email(s) (showing newest first)")
+            else:
+                st.info("📭 No emails found in inbox")
+                st.session_state.fetched_emails = []
+                st.session_state.email_options = {}
+    
+    if 'fetched_emails' in st.session_state and st.session_state.fetched_emails:
+        _render_emails_list()
+
+
+@st.fragment
+def _render_emails_list():
+    """Fetched-emails listing; interactions here rerun only this fragment"""
+    st.markdown(f"**Showing last {len(st.session_state.fetched_emails)} emails:**")
+    for idx, email in enumerate(st.session_state.fetched_emails):
+        with st.expander(f"📧 {email.get('subject', 'No Subject')} - From: {email.get('from', 'Unknown')}"):
+            st.markdown(f"**From:** {email.get('from', 'N/A')}")
+            st.markdown(f"**Subject:** {email.get('subject', 'N/A')}")
+            st.markdown(f"**Body:**")
+            st.text((email['body_preview'] or 'N/A') + ("..." if email['body_truncated'] else ""))
+
+
+@st.cache_resource
+def agent_executor() -> ThreadPoolExecutor:
+    """Process-wide pool used to build HR agents off the script thread"""
+    return ThreadPoolExecutor(max_workers=2)
+
+
+# Expires with the Gemini context cache the agent's chain may point at
+@st.cache_resource(max_entries=32, ttl=GEMINI_CONTEXT_CACHE_TTL or None, show_spinner=False)
+def shared_hr_agent(resume_key: str, jd_key: str, candidate_email: str, hr_name: str,
+                    _resume_data: Dict, _job_description_text: str):
+    """Process-wide HR agent per resume/JD pair (only the key arguments are hashed)"""
+    from agents import create_hr_agent
+    return create_hr_agent(
+        resume_data=_resume_data,
+        job_description_text=_job_description_text,
+        candidate_email=candidate_email,
+        hr_name=hr_name
+    )
+
+
+def resolve_hr_agent():
+    """Return the HR agent, waiting for a background build still in flight"""
+    future = st.session_state.hr_agent_future
+    if future is not None:
+        st.session_state.hr_agent_future = None
+        st.session_state.hr_agent = future.result()
+    return st.session_state.hr_agent
+
+
+@st.fragment
+def chat_tab_fragment():
+    """Chat tab; sending a message reruns only this fragment"""
+    st.markdown("### 💬 Chat with HR Assistant")
+    
+    if st.session_state.hr_agent or st.session_state.hr_agent_future:
+        # Display chat history
+        for message in st.session_state.chat_history:
+            with st.chat_message(message['role']):
+                st.markdown(message['content'])
+        
+        # Chat input
+        user_query = st.chat_input(
+            "e.g., 'How much experience does this candidate have?' or 'Prepare an email for interview invitation'",
+            key="chat_input"
+        )
+        
+        if user_query:
+            with st.chat_message('user'):
+                st.markdown(user_query)
+            try:
+                # Get email credentials for sending
+                smtp_username = st.session_state.email_credentials['username'] or EMAIL_USERNAME
+                smtp_password = st.session_state.email_credentials['password'] or EMAIL_PASSWORD
+                smtp_server = st.session_state.email_credentials['server'] or EMAIL_SERVER
+                smtp_port = st.session_state.email_credentials['port'] or EMAIL_PORT
+                
+                # Tokens are drawn as they arrive; the finished message is already
+                # on the page, so no rerun is needed afterwards
+                with st.chat_message('assistant'):
+                    # The agent was built in the background while the HR read the
+                    # analysis; this only waits if that build is still running
+                    response = st.write_stream(resolve_hr_agent().chat_stream(
+                        user_query,
+                        smtp_username=smtp_username if smtp_username else None,
+                        smtp_password=smtp_password if smtp_password else None,
+                        smtp_server=smtp_server if smtp_server else None,
+                        smtp_port=smtp_port if smtp_port else None
+                    ))
+                st.session_state.chat_history.append({
+                    'role': 'user',
+                    'content': user_query
+                })
+                st.session_state.chat_history.append({
+                    'role': 'assistant',
+                    'content': response
+                })
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+    else:
+        st.info("👆 Please process files first to start chatting with the agent")
+
+
+@st.fragment
+def send_email_fragment(creds: CredentialsState):
+    """Send Email tab; its widgets and the post-send cleanup rerun only this fragment"""
+    st.markdown("#### ✉️ Send Email")
+    
+    # Get extracted email if available
+    extracted_email = ""
+    if st.session_state.resume_analysis and st.session_state.resume_analysis.get('email'):
+        extracted_email = st.session_state.resume_analysis.get('email', '')
+    
+    # Email recipient (editable, pre-filled with extracted email)
+    recipient_email = st.text_input(
+        "To (Recipient Email):",
+        value=extracted_email,
+        placeholder="Enter recipient email address",
+        help="Email will be pre-filled if candidate email was extracted from resume"
+    )
+    
+    # Toggle for using candidate context
+    use_candidate_context = False
+    if st.session_state.resume_analysis and extracted_email:
+        use_candidate_context = st.checkbox(
+            "📋 Use Candidate Data (Personalize email using resume and job description)",
+            value=True,
+            help="If enabled, AI will use candidate and job description context. If disabled, write generic email."
+        )
+    
+    st.markdown("---")
+    
+    # AI Email Writing Assistant
+    st.markdown("### 🤖 AI Email Writing Assistant")
+    use_ai_assistant = st.checkbox("Use AI to help write email", value=False)
+    
+    if use_ai_assistant:
+        user_prompt = st.text_area(
+            "Describe what you want in the email:",
+            height=100,
+            placeholder="e.g., 'Write an interview invitation email for next week Tuesday at 2 PM' or 'Create a rejection email that is polite and encouraging'"
+        )
+        
+        if st.button("✍️ Generate Email with AI", type="primary"):
+            if user_prompt:
+                with st.spinner("🤖 AI is writing your email..."):
+                    try:
+                        candidate_data = st.session_state.resume_analysis if use_candidate_context else None
+                        job_desc = st.session_state.job_description_text if use_candidate_context else None
+                        
+                        # Clicking again for the same request asks for a fresh draft
+                        # instead of the one stored in the LLM response cache
+                        request_key = (user_prompt, use_candidate_context)
+                        regenerate = st.session_state.get('last_email_request') == request_key
+                        
+                        from agents.email_writing_agent import generate_email_with_ai
+                        generated = generate_email_with_ai(
+                            user_prompt=user_prompt,
+                            use_candidate_context=use_candidate_context,
+                            candidate_data=candidate_data,
+                            job_description=job_desc,
+                            bypass_cache=regenerate
+                        )
+                        
+                        # Store generated email in session state
+                        st.session_state.last_email_request = request_key
+                        st.session_state.generated_email_subject = generated.get('subject', '')
+                        st.session_state.generated_email_body = generated.get('body', '')
+                        st.success("✅ Email generated! Review and edit if needed below.")
+                    except Exception as e:
+                        st.error(f"❌ Error generating email: {str(e)}")
+            else:
+                st.warning("⚠️ Please describe what you want in the email")
+    
+    st.markdown("---")
+    st.markdown("### 📝 Email Content")
+    
+    # Subject field (pre-filled if AI generated)
+    email_subject = st.text_input(
+        "Subject:",
+        value=st.session_state.get('generated_email_subject', ''),
+        placeholder="e.g., Interview Invitation - Software Engineer Position"
+    )
+    
+    # Body field (pre-filled if AI generated)
+    email_body = st.text_area(
+        "Email Body:",
+        value=st.session_state.get('generated_email_body', ''),
+        height=200,
+        placeholder="Enter your email content here..."
+    )
+    
+    # Check credentials before allowing send
+    if not creds.is_admin and not creds.smtp_ready:
+        st.error("❌ Please configure your email credentials in the sidebar to send emails.")
+        return
+    
+    # Send button
+    if st.button("✉️ Send Email", type="primary", use_container_width=True):
+        if not recipient_email:
+            st.error("❌ Please enter recipient email address")
+        elif not email_subject:
+            st.error("❌ Please enter email subject")
+        elif not email_body:
+            st.error("❌ Please enter email body")
+        else:
+            # Get credentials (use custom if provided, else use defaults)
+            smtp_username = st.session_state.email_credentials['username'] or EMAIL_USERNAME
+            # Use password from session state if set, otherwise from .env
+            smtp_password = st.session_state.email_credentials.get('password') or EMAIL_PASSWORD
+            
+            smtp_server = st.session_state.email_credentials['server'] or EMAIL_SERVER
+            smtp_port = st.session_state.email_credentials['port'] or EMAIL_PORT
+            
+            if not all([smtp_username, smtp_password, smtp_server, smtp_port]):
+                st.error("❌ Please configure email credentials in the sidebar")
+            else:
+                # Extract recipient name from email
+                recipient_name = recipient_email.split("@")[0].split(".")[0].capitalize() if "@" in recipient_email else "Recipient"
+                
+                with st.spinner("Sending email..."):
+                    try:
+                        from utils.email_helper import send_email_with_credentials
+                        success = send_email_with_credentials(
+                            recipient_email=recipient_email,
+                            subject=email_subject,
+                            body=email_body,
+                            sender_name=recipient_name,
+                            hr_name=st.session_state.hr_name,
+                            smtp_username=smtp_username,
+                            smtp_password=smtp_password,
+                            smtp_server=smtp_server,
+                            smtp_port=smtp_port
+                        )
+                        if success:
+                            st.success(f"✅ Email sent successfully to {recipient_email}!")
+                            # Clear generated email from session state (only this fragment reruns)
+                            st.session_state.pop('generated_email_subject', None)
+                            st.session_state.pop('generated_email_body', None)
+                        else:
+                            st.error("❌ Failed to send email. Please check your email configuration.")
+                    except Exception as e:
+                        st.error(f"❌ Error sending email: {str(e)}")
 
 
 def main_dashboard():
@@ -286,44 +713,62 @@ def main_dashboard():
             if job_desc_file and resume_file:
                 with st.spinner("Processing files and analyzing..."):
                     try:
-                        # Save uploaded files
-                        job_desc_path = save_uploaded_file(job_desc_file, "job_desc")
-                        resume_path = save_uploaded_file(resume_file, "resume")
-                        
-                        # Extract job description text
-                        st.session_state.job_description_text = extract_text_from_file(job_desc_path)
-                        
-                        # Extract resume text for context
-                        resume_text = extract_text_from_file(resume_path)
+                        from agents import analyze_resume
                         
-                        # Analyze resume
-                        st.session_state.resume_analysis = analyze_resume_from_files(
-                            resume_file_path=resume_path,
-                            job_description_file_path=job_desc_path
-                        )
-                        
-                        # Add resume text to analysis data for better context
-                        if st.session_state.resume_analysis:
-                            st.session_state.resume_analysis['resume_text'] = resume_text
+                        # Same resume + JD bytes as an earlier run: reuse that analysis
+                        cache_key = (file_digest(resume_file), file_digest(job_desc_file))
+                        cached = st.session_state.analysis_cache.get(cache_key)
+                        if cached:
+                            st.session_state.job_description_text, st.session_state.resume_analysis = cached
+                        else:
+                            # Extract job description and resume text concurrently
+                            # (PDF/DOCX parsing is mostly I/O and C extension work)
+                            with ThreadPoolExecutor(max_workers=2) as executor:
+                                job_desc_future = executor.submit(
+                                    extract_uploaded_text,
+                                    job_desc_file.getvalue(), Path(job_desc_file.name).suffix
+                                )
+                                resume_future = executor.submit(
+                                    extract_uploaded_text,
+                                    resume_file.getvalue(), Path(resume_file.name).suffix
+                                )
+                                st.session_state.job_description_text = job_desc_future.result()
+                                resume_text = resume_future.result()
+                            
+                            # Analyze resume (texts are already extracted, so no second parse)
+                            st.session_state.resume_analysis = analyze_resume(
+                                resume_text,
+                                st.session_state.job_description_text
+                            )
+                            
+                            # Add resume text to analysis data for better context
+                            if st.session_state.resume_analysis:
+                                st.session_state.resume_analysis['resume_text'] = resume_text
+                                st.session_state.analysis_cache[cache_key] = (
+                                    st.session_state.job_description_text,
+                                    st.session_state.resume_analysis
+                                )
                         
-                        # Create HR agent
+                        # Look up the shared HR agent here (Streamlit caches need the
+                        # script thread) and fork it with its own chat memory in the
+                        # background, which may compile its chain; the chat tab picks
+                        # it up on the first question
                         if st.session_state.resume_analysis and st.session_state.resume_analysis.get('email'):
-                            st.session_state.hr_agent = create_hr_agent(
-                                resume_data=st.session_state.resume_analysis,
-                                job_description_text=st.session_state.job_description_text,
-                                candidate_email=st.session_state.resume_analysis['email'],
-                                hr_name=st.session_state.hr_name
+                            shared_agent = shared_hr_agent(
+                                *cache_key,
+                                st.session_state.resume_analysis['email'],
+                                st.session_state.hr_name,
+                                # A copy, so the cached agent holds no reference
+                                # to this session's analysis dict
+                                dict(st.session_state.resume_analysis),
+                                st.session_state.job_description_text
                             )
+                            st.session_state.hr_agent = None
+                            st.session_state.hr_agent_future = agent_executor().submit(shared_agent.fork)
                             st.session_state.chat_history = []
                             st.success("✅ Analysis complete! You can now chat with the agent.")
                         else:
                             st.error("❌ Could not extract candidate email from resume")
-                        
-                        # Clean up temporary files
-                        if job_desc_path and os.path.exists(job_desc_path):
-                            os.unlink(job_desc_path)
-                        if resume_path and os.path.exists(resume_path):
-                            os.unlink(resume_path)
                             
                     except Exception as e:
                         st.error(f"❌ Error processing files: {str(e)}")
@@ -337,12 +782,19 @@ def main_dashboard():
             st.session_state.authenticated = False
             st.session_state.resume_analysis = None
             st.session_state.hr_agent = None
+            st.session_state.hr_agent_future = None
             st.session_state.chat_history = []
+            st.session_state.analysis_cache = {}
+            st.session_state.summary_cache = {}
+            close_imap_pool()
             st.rerun()
     
     # Main content area
     st.markdown("<div class='main-header'>🚀 HR Workflow Automation Platform</div>", unsafe_allow_html=True)
     
+    # Credential checks shared by the email tabs (the sidebar inputs are final by now)
+    creds = credentials_state()
+    
     # Tabs for different sections
     tab1, tab2, tab3 = st.tabs(["📊 Analysis Results", "💬 Chat with Agent", "📧 Email Management"])
     
@@ -416,63 +868,7 @@ def main_dashboard():
     
     # Tab 2: Chat Interface
     with tab2:
-        st.markdown("### 💬 Chat with HR Assistant")
-        
-        if st.session_state.hr_agent:
-            # Display chat history
-            for message in st.session_state.chat_history:
-                if message['role'] == 'user':
-                    st.markdown(f"""
-                    <div class='chat-message user-message'>
-                        <strong>You:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div class='chat-message agent-message'>
-                        <strong>Assistant:</strong> {message['content']}
-                    </div>
-                    """, unsafe_allow_html=True)
-            
-            # Chat input
-            user_query = st.text_input(
-                "Ask a question or give an instruction:",
-                key="chat_input",
-                placeholder="e.g., 'How much experience does this candidate have?' or 'Prepare an email for interview invitation'"
-            )
-            
-            col1, col2 = st.columns([1, 4])
-            with col1:
-                if st.button("Send", type="primary"):
-                    if user_query:
-                        with st.spinner("Thinking..."):
-                            try:
-                                # Get email credentials for sending
-                                smtp_username = st.session_state.email_credentials['username'] or EMAIL_USERNAME
-                                smtp_password = st.session_state.email_credentials['password'] or EMAIL_PASSWORD
-                                smtp_server = st.session_state.email_credentials['server'] or EMAIL_SERVER
-                                smtp_port = st.session_state.email_credentials['port'] or EMAIL_PORT
-                                
-                                response = st.session_state.hr_agent.chat(
-                                    user_query,
-                                    smtp_username=smtp_username if smtp_username else None,
-                                    smtp_password=smtp_password if smtp_password else None,
-                                    smtp_server=smtp_server if smtp_server else None,
-                                    smtp_port=smtp_port if smtp_port else None
-                                )
-                                st.session_state.chat_history.append({
-                                    'role': 'user',
-                                    'content': user_query
-                                })
-                                st.session_state.chat_history.append({
-                                    'role': 'assistant',
-                                    'content': response
-                                })
-                                st.rerun()
-                            except Exception as e:
-                                st.error(f"Error: {str(e)}")
-        else:
-            st.info("👆 Please process files first to start chatting with the agent")
+        chat_tab_fragment()
     
     # Tab 3: Email Management
     with tab3:
@@ -481,258 +877,43 @@ def main_dashboard():
         email_tab1, email_tab2, email_tab3 = st.tabs(["📥 Fetch Emails", "📝 Summarize Email", "✉️ Send Email"])
         
         with email_tab1:
-            st.markdown("#### Fetch and View Emails")
-            
-            # Check if user has configured email credentials
-            has_imap_creds = (st.session_state.email_credentials.get('imap_username') and 
-                            st.session_state.email_credentials.get('imap_password'))
-            is_admin = st.session_state.get('is_admin', False)
-            
-            if not is_admin and not has_imap_creds:
-                st.error("❌ Please configure your email credentials in the sidebar to fetch emails.")
-                st.info("📝 Go to the sidebar → Email Settings → Configure your IMAP credentials")
-            else:
-                # Add option to limit number of emails
-                max_emails_to_fetch = st.number_input(
-                    "Maximum emails to fetch:",
-                    min_value=10,
-                    max_value=100,
-                    value=50,
-                    step=10,
-                    help="Limiting the number helps prevent connection timeouts"
-                )
-                
-                if st.button("🔄 Fetch Emails", type="primary"):
-                    # For non-admin, must have credentials configured
-                    if not is_admin and not has_imap_creds:
-                        st.error("❌ Please configure your email credentials in the sidebar first.")
-                    elif (st.session_state.email_credentials.get('imap_username') and 
-                          st.session_state.email_credentials.get('imap_password')):
-                        with st.spinner(f"Fetching up to {max_emails_to_fetch} emails... This may take a moment."):
-                            try:
-                                # Get IMAP port from credentials or use default
-                                imap_port = 993  # Default SSL port
-                                if 'imap_port' in st.session_state.email_credentials:
-                                    try:
-                                        imap_port = int(st.session_state.email_credentials.get('imap_port', 993))
-                                    except (ValueError, TypeError):
-                                        imap_port = 993
-                                
-                                emails = fetch_imap_emails(
-                                    username=st.session_state.email_credentials['imap_username'],
-                                    password=st.session_state.email_credentials['imap_password'],
-                                    imap_server=st.session_state.email_credentials['imap_server'],
-                                    max_emails=max_emails_to_fetch,
-                                    port=imap_port
-                                )
-                                
-                                if emails:
-                                    # emails are returned in reverse order (newest first)
-                                    # Take first N emails (newest first)
-                                    st.session_state.fetched_emails = emails[:max_emails_to_fetch]
-                                    st.success(f"✅ Successfully fetched {len(st.session_state.fetched_emails)} email(s) (showing newest first)")
-                                else:
-                                    st.info("📭 No emails found in inbox")
-                                    st.session_state.fetched_emails = []
-                                    
-                            except Exception as e:
-                                error_msg = str(e)
-                                st.error(f"❌ Error fetching emails: {error_msg}")
-                                
-                                # Provide helpful troubleshooting tips
-                                with st.expander("🔧 Troubleshooting Tips"):
-                                    st.markdown("""
-                                **Common issues and solutions:**
-                                1. **Connection timeout**: Try reducing the maximum emails to fetch
-                                2. **Authentication error**: Verify your IMAP app password is correct
-                                3. **Server error**: Check if IMAP is enabled in your email account settings
-                                4. **Network issue**: Check your internet connection
-                                5. **Gmail users**: Make sure "Less secure app access" is enabled or use an App Password
-                                
-                                **For Gmail:**
-                                - Enable 2-Step Verification
-                                - Generate an App Password from Google Account settings
-                                - Use the App Password (16 characters) instead of your regular password
-                                """)
-                    else:
-                        st.warning("⚠️ Please configure IMAP credentials in the sidebar")
-            
-            if 'fetched_emails' in st.session_state and st.session_state.fetched_emails:
-                st.markdown(f"**Showing last {len(st.session_state.fetched_emails)} emails:**")
-                for idx, email in enumerate(st.session_state.fetched_emails):
-                    with st.expander(f"📧 {email.get('subject', 'No Subject')} - From: {email.get('from', 'Unknown')}"):
-                        st.markdown(f"**From:** {email.get('from', 'N/A')}")
-                        st.markdown(f"**Subject:** {email.get('subject', 'N/A')}")
-                        st.markdown(f"**Body:**")
-                        email_body = email.get('body') or 'N/A'
-                        if email_body and email_body != 'N/A' and len(email_body) > 500:
-                            st.text(email_body[:500] + "...")
-                        else:
-                            st.text(email_body)
+            email_fetch_fragment(creds)
         
         with email_tab2:
             st.markdown("#### Summarize an Email")
             
             # Check credentials
-            is_admin = st.session_state.get('is_admin', False)
-            has_imap_creds = (st.session_state.email_credentials.get('imap_username') and 
-                            st.session_state.email_credentials.get('imap_password'))
-            
-            if not is_admin and not has_imap_creds:
+            if not creds.is_admin and not creds.has_imap:
                 st.error("❌ Please configure your email credentials in the sidebar to summarize emails.")
             elif 'fetched_emails' in st.session_state and st.session_state.fetched_emails:
-                email_options = {f"{email.get('subject', 'No Subject')} - {email.get('from', 'Unknown')}": idx 
-                                for idx, email in enumerate(st.session_state.fetched_emails)}
-                selected_email_label = st.selectbox("Select an email to summarize:", list(email_options.keys()))
+                email_options = st.session_state.get('email_options', {})
+                selected_email_labels = st.multiselect("Select emails to summarize:", list(email_options.keys()))
                 
-                if st.button("📝 Summarize", type="primary"):
-                    selected_idx = email_options[selected_email_label]
-                    selected_email = st.session_state.fetched_emails[selected_idx]
-                    with st.spinner("Generating summary..."):
+                if st.button("📝 Summarize", type="primary", disabled=not selected_email_labels):
+                    selected_emails = [st.session_state.fetched_emails[email_options[label]]
+                                       for label in selected_email_labels]
+                    with st.spinner("Generating summaries..."):
                         try:
-                            summary = summarize_email(selected_email)
+                            # Only emails not summarized earlier in this session go to the LLM;
+                            # those are packed into as few calls as the token budget allows
+                            summary_cache = st.session_state.summary_cache
+                            keys = [email_digest(email) for email in selected_emails]
+                            missing = {key: email for key, email in zip(keys, selected_emails)
+                                       if key not in summary_cache}
+                            if missing:
+                                from agents.summarization_agent import summarize_emails
+                                summary_cache.update(zip(missing, summarize_emails(list(missing.values()))))
                             st.markdown("#### Summary:")
-                            st.info(summary)
+                            for label, key in zip(selected_email_labels, keys):
+                                st.markdown(f"**{label}**")
+                                st.info(summary_cache[key])
                         except Exception as e:
                             st.error(f"Error: {str(e)}")
             else:
                 st.info("👆 Please fetch emails first")
         
         with email_tab3:
-            st.markdown("#### ✉️ Send Email")
-            
-            # Get extracted email if available
-            extracted_email = ""
-            if st.session_state.resume_analysis and st.session_state.resume_analysis.get('email'):
-                extracted_email = st.session_state.resume_analysis.get('email', '')
-            
-            # Email recipient (editable, pre-filled with extracted email)
-            recipient_email = st.text_input(
-                "To (Recipient Email):",
-                value=extracted_email,
-                placeholder="Enter recipient email address",
-                help="Email will be pre-filled if candidate email was extracted from resume"
-            )
-            
-            # Toggle for using candidate context
-            use_candidate_context = False
-            if st.session_state.resume_analysis and extracted_email:
-                use_candidate_context = st.checkbox(
-                    "📋 Use Candidate Data (Personalize email using resume and job description)",
-                    value=True,
-                    help="If enabled, AI will use candidate and job description context. If disabled, write generic email."
-                )
-            
-            st.markdown("---")
-            
-            # AI Email Writing Assistant
-            st.markdown("### 🤖 AI Email Writing Assistant")
-            use_ai_assistant = st.checkbox("Use AI to help write email", value=False)
-            
-            if use_ai_assistant:
-                user_prompt = st.text_area(
-                    "Describe what you want in the email:",
-                    height=100,
-                    placeholder="e.g., 'Write an interview invitation email for next week Tuesday at 2 PM' or 'Create a rejection email that is polite and encouraging'"
-                )
-                
-                if st.button("✍️ Generate Email with AI", type="primary"):
-                    if user_prompt:
-                        with st.spinner("🤖 AI is writing your email..."):
-                            try:
-                                candidate_data = st.session_state.resume_analysis if use_candidate_context else None
-                                job_desc = st.session_state.job_description_text if use_candidate_context else None
-                                
-                                generated = generate_email_with_ai(
-                                    user_prompt=user_prompt,
-                                    use_candidate_context=use_candidate_context,
-                                    candidate_data=candidate_data,
-                                    job_description=job_desc
-                                )
-                                
-                                # Store generated email in session state
-                                st.session_state.generated_email_subject = generated.get('subject', '')
-                                st.session_state.generated_email_body = generated.get('body', '')
-                                st.success("✅ Email generated! Review and edit if needed below.")
-                            except Exception as e:
-                                st.error(f"❌ Error generating email: {str(e)}")
-                    else:
-                        st.warning("⚠️ Please describe what you want in the email")
-            
-            st.markdown("---")
-            st.markdown("### 📝 Email Content")
-            
-            # Subject field (pre-filled if AI generated)
-            email_subject = st.text_input(
-                "Subject:",
-                value=st.session_state.get('generated_email_subject', ''),
-                placeholder="e.g., Interview Invitation - Software Engineer Position"
-            )
-            
-            # Body field (pre-filled if AI generated)
-            email_body = st.text_area(
-                "Email Body:",
-                value=st.session_state.get('generated_email_body', ''),
-                height=200,
-                placeholder="Enter your email content here..."
-            )
-            
-            # Check credentials before allowing send
-            is_admin = st.session_state.get('is_admin', False)
-            has_smtp_creds = (st.session_state.email_credentials.get('username') and 
-                            st.session_state.email_credentials.get('password'))
-            
-            if not is_admin and not has_smtp_creds:
-                st.error("❌ Please configure your email credentials in the sidebar to send emails.")
-                st.stop()
-            
-            # Send button
-            if st.button("✉️ Send Email", type="primary", use_container_width=True):
-                if not recipient_email:
-                    st.error("❌ Please enter recipient email address")
-                elif not email_subject:
-                    st.error("❌ Please enter email subject")
-                elif not email_body:
-                    st.error("❌ Please enter email body")
-                else:
-                    # Get credentials (use custom if provided, else use defaults)
-                    smtp_username = st.session_state.email_credentials['username'] or EMAIL_USERNAME
-                    # Use password from session state if set, otherwise from .env
-                    smtp_password = st.session_state.email_credentials.get('password') or EMAIL_PASSWORD
-                    
-                    smtp_server = st.session_state.email_credentials['server'] or EMAIL_SERVER
-                    smtp_port = st.session_state.email_credentials['port'] or EMAIL_PORT
-                    
-                    if not all([smtp_username, smtp_password, smtp_server, smtp_port]):
-                        st.error("❌ Please configure email credentials in the sidebar")
-                    else:
-                        # Extract recipient name from email
-                        recipient_name = recipient_email.split("@")[0].split(".")[0].capitalize() if "@" in recipient_email else "Recipient"
-                        
-                        with st.spinner("Sending email..."):
-                            try:
-                                success = send_email_with_credentials(
-                                    recipient_email=recipient_email,
-                                    subject=email_subject,
-                                    body=email_body,
-                                    sender_name=recipient_name,
-                                    hr_name=st.session_state.hr_name,
-                                    smtp_username=smtp_username,
-                                    smtp_password=smtp_password,
-                                    smtp_server=smtp_server,
-                                    smtp_port=smtp_port
-                                )
-                                if success:
-                                    st.success(f"✅ Email sent successfully to {recipient_email}!")
-                                    # Clear generated email from session state
-                                    if 'generated_email_subject' in st.session_state:
-                                        del st.session_state.generated_email_subject
-                                    if 'generated_email_body' in st.session_state:
-                                        del st.session_state.generated_email_body
-                                else:
-                                    st.error("❌ Failed to send email. Please check your email configuration.")
-                            except Exception as e:
-                                st.error(f"❌ Error sending email: {str(e)}")
+            send_email_fragment(creds)
 
 
 # Main app logic
@@ -25,4 +25,11 @@ ADMIN_EMAIL = os.getenv("EMAIL_USERNAME")
 IMAP_USERNAME = os.getenv("IMAP_USERNAME", EMAIL_USERNAME)  # defaults to EMAIL_USERNAME if not set
 IMAP_PASSWORD = os.getenv("IMAP_PASSWORD", EMAIL_PASSWORD)
 IMAP_SERVER = os.getenv("IMAP_SERVER", "imap.gmail.com")
-IMAP_PORT = os.getenv("IMAP_PORT", 993)
\ No newline at end of file
+IMAP_PORT = os.getenv("IMAP_PORT", 993)
+
+# LLM response cache (SQLite file used by agents/_cache.py)
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", ".llm_cache.db")
+
+# Gemini explicit context caching for the HR agent's system prompt.
+# TTL in seconds; 0 disables it (Gemini's implicit prefix caching still applies)
+GEMINI_CONTEXT_CACHE_TTL = int(os.getenv("GEMINI_CONTEXT_CACHE_TTL", "0"))
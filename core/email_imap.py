@@ -1,120 +1,193 @@
 # core/email_imap.py
+import asyncio
+import binascii
+import codecs
+import functools
 import imaplib
-import email
+import quopri
+import re
 import socket
 from email.header import decode_header
+from email.message import Message
+from email.parser import BytesHeaderParser, BytesParser
 from utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def fetch_imap_emails(username, password, imap_server="imap.gmail.com", max_emails=50, port=993):
+# Start of a FETCH response line: b'<seq> (...', and the UID item inside it
+_FETCH_START_RE = re.compile(rb'^(\d+) \(')
+_FETCH_UID_RE = re.compile(rb'[( ]UID (\d+)')
+_SEXP_TOKEN_RE = re.compile(rb'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|(\{)|([^\s()"{]+))', re.DOTALL)
+
+# Headers requested for the listing; the text part is fetched separately
+_HEADER_ITEMS = "(BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS (FROM SUBJECT)])"
+# Header-only parser: never builds a MIME tree for the body
+_HEADER_PARSER = BytesHeaderParser()
+# Full-message parser, shared instead of one per email.message_from_bytes() call
+_PARSER = BytesParser()
+
+# Seconds to wait for the TCP/TLS connection, and for any later server reply
+# (bulk FETCHes of many messages can take well over the old 30s on slow servers)
+IMAP_CONNECT_TIMEOUT = 30
+IMAP_READ_TIMEOUT = 120
+
+# Bodies are transfer- and charset-decoded in chunks of about this many bytes
+_DECODE_CHUNK_SIZE = 64 * 1024
+_NON_BASE64_RE = re.compile(rb'[^A-Za-z0-9+/=]')
+
+def connect_imap(username, password, imap_server="imap.gmail.com", port=993):
     """
-    Fetch emails from IMAP server with proper error handling and connection management.
+    Open an SSL IMAP connection and log in.
+    
+    The returned connection can be passed to fetch_imap_emails(mail=...) to
+    reuse it across fetches; the caller is then responsible for logout().
     
     Args:
         username: IMAP username/email
         password: IMAP password/app password
         imap_server: IMAP server address (default: imap.gmail.com)
-        max_emails: Maximum number of emails to fetch (default: 50)
         port: IMAP port (default: 993 for SSL)
         
     Returns:
-        List of email dictionaries
+        Authenticated imaplib.IMAP4_SSL connection
     """
-    mail = None
+    # Connect to IMAP server; timeouts are set on this connection's socket
+    # only, not via socket.setdefaulttimeout (which would affect every
+    # other socket in the process)
+    logger.debug("Connecting to IMAP server: %s:%s", imap_server, port)
     try:
-        # Set socket timeout to prevent hanging
-        socket.setdefaulttimeout(30)  # 30 second timeout
-        
-        # Connect to IMAP server
-        logger.debug(f"Connecting to IMAP server: {imap_server}:{port}")
+        mail = imaplib.IMAP4_SSL(imap_server, port, timeout=IMAP_CONNECT_TIMEOUT)
+    except TypeError:  # Python < 3.9 has no timeout parameter
         mail = imaplib.IMAP4_SSL(imap_server, port)
-        
-        # Login
-        logger.debug(f"Logging in as {username}")
+    _tune_socket(mail.sock, IMAP_READ_TIMEOUT)
+    
+    # Login
+    logger.debug("Logging in as %s", username)
+    try:
         mail.login(username, password)
+    except Exception:
+        mail.shutdown()
+        raise
+    return mail
+
+
+def _tune_socket(sock, timeout):
+    """Enable TCP keepalive (so idle pooled connections stay up) and set the read timeout."""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    sock.settimeout(timeout)
+
+
+def fetch_imap_emails(username, password, imap_server="imap.gmail.com", max_emails=50, port=993,
+                      bulk=True, progress_callback=None, mail=None, batch_size=100,
+                      partial=True, mailbox="inbox", cache=None):
+    """
+    Fetch emails from IMAP server with proper error handling and connection management.
+    
+    Args:
+        username: IMAP username/email
+        password: IMAP password/app password
+        imap_server: IMAP server address (default: imap.gmail.com)
+        max_emails: Maximum number of emails to fetch (default: 50)
+        port: IMAP port (default: 993 for SSL)
+        bulk: Fetch messages with one FETCH command per batch instead of one
+            round-trip per message (default: True)
+        progress_callback: Optional callable(done, total) invoked as each
+            message is processed
+        mail: Optional already-authenticated connection from connect_imap();
+            it is reused and left open. When omitted a new connection is
+            opened, and closed again once the fetch completes
+        batch_size: Maximum number of messages requested by one bulk FETCH,
+            keeping command lines within server limits (default: 100)
+        partial: With bulk, download only the From/Subject headers and the
+            text/plain part (located via BODYSTRUCTURE) instead of the whole
+            RFC822 message with its HTML and attachments (default: True)
+        mailbox: Mailbox/folder to read (default: inbox)
+        cache: Optional dict owned by the caller, reused across calls for the
+            same account and mailbox. Parsed emails are stored in it by UID, so
+            later calls only download messages that arrived since; entries
+            outside the latest max_emails are dropped
         
-        # Select inbox
-        status, response = mail.select("inbox")
+    Returns:
+        List of email dictionaries ("id" is the message UID)
+    """
+    owns_connection = mail is None
+    try:
+        if owns_connection:
+            mail = connect_imap(username, password, imap_server, port)
+        
+        # Select the mailbox (re-selecting on a reused connection picks up new mail)
+        status, response = mail.select(mailbox)
         if status != 'OK':
-            raise Exception(f"Failed to select inbox: {response}")
+            raise Exception(f"Failed to select {mailbox}: {response}")
+        
+        # UIDs only change when the server bumps UIDVALIDITY, so cache entries
+        # are keyed by both; the reply is one of select()'s untagged responses
+        uidvalidity = mail.response("UIDVALIDITY")[1][-1]
         
-        # Get total number of messages
-        status, response = mail.search(None, "ALL")
+        # Get total number of messages, by UID: unlike sequence numbers these
+        # do not shift when other clients expunge messages
+        status, response = mail.uid("search", None, "ALL")
         if status != 'OK':
             raise Exception(f"Failed to search emails: {response}")
         
         email_ids = response[0].split()
         total_emails = len(email_ids)
-        logger.debug(f"Found {total_emails} total emails in inbox")
+        logger.debug("Found %s total emails in inbox", total_emails)
         
         # Limit the number of emails to fetch (get most recent ones)
-        # IMAP email IDs are typically in ascending order (1, 2, 3...), where higher numbers = newer emails
+        # UIDs are assigned in ascending order, so higher numbers = newer emails
         if total_emails > max_emails:
             # Get last N email IDs (which are the newest emails)
             email_ids = email_ids[-max_emails:]
-            logger.debug(f"Limiting to last {max_emails} emails")
+            logger.debug("Limiting to last %s emails", max_emails)
+        
+        if cache is not None:
+            # Drop what fell out of the window, then only download the rest
+            wanted = {(uidvalidity, num) for num in email_ids}
+            for key in [key for key in cache if key not in wanted]:
+                del cache[key]
+            new_ids = [num for num in email_ids if (uidvalidity, num) not in cache]
+            logger.debug("%s emails served from cache", len(email_ids) - len(new_ids))
+        else:
+            new_ids = email_ids
         
         emails = []
         
         # Process emails in reverse order so newest comes first
         # email_ids are [oldest...newest], so reversed() gives [newest...oldest]
         # This ensures emails[0] is the newest email
+        if bulk and partial:
+            fetched = _fetch_partial(mail, new_ids, batch_size)
+            parse = lambda num, parsed: parsed
+        elif bulk:
+            fetched = _fetch_bulk(mail, new_ids, batch_size)
+            parse = _parse_email
+        else:
+            fetched = _fetch_each(mail, new_ids)
+            parse = _parse_email
+        
+        total = len(email_ids)
         for i, num in enumerate(reversed(email_ids), 1):
-            try:
-                logger.debug(f"Fetching email {i}/{len(email_ids)} (ID: {num.decode()})")
-                
-                # Fetch email
-                status, msg_data = mail.fetch(num, "(RFC822)")
-                if status != 'OK':
-                    logger.warning(f"Failed to fetch email {num.decode()}: {msg_data}")
-                    continue
-                
-                if not msg_data or not msg_data[0]:
-                    logger.warning(f"No data for email {num.decode()}")
-                    continue
-                
-                raw_email = msg_data[0][1]
-                if not raw_email:
-                    logger.warning(f"Empty email data for {num.decode()}")
-                    continue
-                
-                # Parse email
-                msg = email.message_from_bytes(raw_email)
-                
-                # Decode subject
-                subject = "No Subject"
-                if msg.get("Subject"):
-                    try:
-                        decoded_subject = decode_header(msg.get("Subject"))
-                        if decoded_subject and decoded_subject[0]:
-                            subject, encoding = decoded_subject[0]
-                            if isinstance(subject, bytes):
-                                subject = subject.decode(encoding if encoding else "utf-8")
-                    except Exception as e:
-                        logger.warning(f"Error decoding subject: {e}")
-                        subject = msg.get("Subject", "No Subject")
-                
-                # Extract email body
+            cached = cache.get((uidvalidity, num)) if cache is not None else None
+            data = fetched.get(num)
+            if cached is not None:
+                # Copied so callers can modify the returned dicts freely
+                emails.append(dict(cached))
+            elif not data:
+                logger.warning("No data for email %s", num.decode())
+            else:
                 try:
-                    body = extract_email_body(msg)
+                    parsed = parse(num, data)
+                    emails.append(parsed)
+                    if cache is not None:
+                        cache[(uidvalidity, num)] = dict(parsed)
                 except Exception as e:
-                    logger.warning(f"Error extracting body for email {num.decode()}: {e}")
-                    body = "Error extracting email body"
-                
-                emails.append({
-                    "id": num.decode(),
-                    "from": msg.get("From", "Unknown"),
-                    "subject": subject,
-                    "body": body
-                })
-                
-            except Exception as e:
-                logger.error(f"Error processing email {num.decode()}: {e}")
-                # Continue with next email instead of failing completely
-                continue
+                    logger.error("Error processing email %s: %s", num.decode(), e)
+                    # Continue with next email instead of failing completely
+            if progress_callback:
+                progress_callback(i, total)
         
-        logger.info(f"Successfully fetched {len(emails)} emails")
+        logger.info("Successfully fetched %s emails", len(emails))
         return emails
         
     except imaplib.IMAP4.error as e:
@@ -134,13 +207,390 @@ def fetch_imap_emails(username, password, imap_server="imap.gmail.com", max_emai
         logger.error(error_msg)
         raise Exception(error_msg)
     finally:
-        # Always try to logout and close connection
-        if mail:
+        # Always try to logout and close a connection opened here
+        if owns_connection and mail:
             try:
                 mail.logout()
                 logger.debug("IMAP connection closed")
             except Exception as e:
-                logger.warning(f"Error closing IMAP connection: {e}")
+                logger.warning("Error closing IMAP connection: %s", e)
+
+
+async def fetch_imap_emails_async(**kwargs):
+    """
+    Awaitable fetch_imap_emails(); takes the same keyword arguments.
+    
+    imaplib is blocking, so the fetch runs in the default executor and the
+    event loop stays free to drive other fetches meanwhile.
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, functools.partial(fetch_imap_emails, **kwargs))
+
+
+async def fetch_many_imap_async(requests, concurrency=4):
+    """
+    Fetch several accounts and/or folders concurrently, one connection each,
+    so the server round-trips of the different fetches overlap.
+    
+    Args:
+        requests: List of keyword-argument dicts for fetch_imap_emails
+            (e.g. the same account with different "mailbox" values)
+        concurrency: Maximum number of simultaneous IMAP connections
+        
+    Returns:
+        List with one result per request, in order: its email list, or the
+        exception raised for it
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    
+    async def _run(kwargs):
+        async with semaphore:
+            return await fetch_imap_emails_async(**kwargs)
+    
+    return await asyncio.gather(*(_run(kwargs) for kwargs in requests), return_exceptions=True)
+
+
+def fetch_many_imap(requests, concurrency=4):
+    """Synchronous wrapper around fetch_many_imap_async() (not for use inside a running event loop)."""
+    return asyncio.run(fetch_many_imap_async(requests, concurrency))
+
+
+def _fetch_bulk(mail, email_ids, batch_size=100):
+    """Fetch messages with one UID FETCH command per batch; returns {uid: raw bytes}."""
+    raw_emails = {}
+    for start in range(0, len(email_ids), batch_size):
+        batch = email_ids[start:start + batch_size]
+        status, msg_data = mail.uid("fetch", b",".join(batch), "(RFC822)")
+        if status != 'OK':
+            raise Exception(f"Failed to fetch emails: {msg_data}")
+        
+        for num, response in _group_fetch_responses(msg_data).items():
+            if response["literals"]:
+                raw_emails[num] = response["literals"][0]
+    return raw_emails
+
+
+def _fetch_partial(mail, email_ids, batch_size=100):
+    """
+    Fetch headers + BODYSTRUCTURE, then only each message's text part.
+    
+    Messages whose structure cannot be interpreted are fetched in full.
+    Returns {uid: email dict}.
+    """
+    parsed = {}
+    sections = {}  # id -> (section, encoding, charset)
+    fallback = []
+    for start in range(0, len(email_ids), batch_size):
+        batch = email_ids[start:start + batch_size]
+        status, msg_data = mail.uid("fetch", b",".join(batch), _HEADER_ITEMS)
+        if status != 'OK':
+            raise Exception(f"Failed to fetch emails: {msg_data}")
+        
+        responses = _group_fetch_responses(msg_data)
+        for num in batch:
+            response = responses.get(num)
+            try:
+                if response is None or response["extra_literals"]:
+                    raise ValueError("unexpected FETCH response")
+                structure = _parse_bodystructure(response["text"])
+                headers = _HEADER_PARSER.parsebytes(response["literals"][0] if response["literals"] else b"")
+            except Exception as e:
+                logger.debug("Falling back to full fetch for email %s: %s", num.decode(), e)
+                fallback.append(num)
+                continue
+            parsed[num] = {
+                "id": num.decode(),
+                "from": headers.get("From", "Unknown"),
+                "subject": _decode_subject(headers),
+                "body": None
+            }
+            located = _find_text_part(structure)
+            if located is not None:
+                sections[num] = located
+    
+    # One FETCH per distinct section number (and batch), typically just "1" and "1.1"
+    by_section = {}
+    for num, (section, _, _) in sections.items():
+        by_section.setdefault(section, []).append(num)
+    for section, nums in by_section.items():
+        for start in range(0, len(nums), batch_size):
+            batch = nums[start:start + batch_size]
+            status, msg_data = mail.uid("fetch", b",".join(batch), f"(BODY.PEEK[{section}])")
+            if status != 'OK':
+                raise Exception(f"Failed to fetch email bodies: {msg_data}")
+            bodies = _group_fetch_responses(msg_data)
+            for num in batch:
+                response = bodies.get(num)
+                raw = response["literals"][0] if response and response["literals"] else b""
+                _, encoding, charset = sections[num]
+                try:
+                    parsed[num]["body"] = _decode_part(raw, encoding, charset)
+                except Exception as e:
+                    logger.warning("Error extracting body for email %s: %s", num.decode(), e)
+                    parsed[num]["body"] = "Error extracting email body"
+    
+    if fallback:
+        for num, raw_email in _fetch_bulk(mail, fallback, batch_size).items():
+            try:
+                parsed[num] = _parse_email(num, raw_email)
+            except Exception as e:
+                logger.error("Error processing email %s: %s", num.decode(), e)
+    return parsed
+
+
+def _group_fetch_responses(msg_data):
+    """
+    Group imaplib UID FETCH output by UID.
+    
+    Returns {uid: {"text": response text without literals, "literals": [bytes],
+    "extra_literals": bool}}; extra_literals marks a literal inside the
+    non-body data (e.g. in BODYSTRUCTURE), which the parser does not handle.
+    Responses are first grouped by the sequence number that starts each line,
+    since servers may send the UID item after the literals.
+    """
+    by_seq = {}
+    current = None
+    for item in msg_data:
+        head = item[0] if isinstance(item, tuple) else item
+        if not isinstance(head, bytes):
+            continue
+        match = _FETCH_START_RE.match(head)
+        if match:
+            # Unsolicited FETCHes (e.g. FLAGS updates) for the same message are merged
+            current = by_seq.setdefault(match.group(1), {"text": b"", "literals": [], "extra_literals": False})
+            current["text"] += head
+            if isinstance(item, tuple):
+                current["literals"].append(item[1])
+        elif current is not None:
+            current["text"] += head
+            if isinstance(item, tuple):
+                current["extra_literals"] = True
+    
+    responses = {}
+    for response in by_seq.values():
+        # Unsolicited FETCHes without a UID item are not ours
+        match = _FETCH_UID_RE.search(response["text"])
+        if match:
+            responses[match.group(1)] = response
+    return responses
+
+
+def _parse_sexp(data, pos=0):
+    """Parse one IMAP parenthesized list starting at data[pos]; returns (list, end)."""
+    stack = []
+    while True:
+        match = _SEXP_TOKEN_RE.match(data, pos)
+        if match is None:
+            raise ValueError("malformed IMAP list")
+        pos = match.end()
+        opened, closed, quoted, literal, atom = match.groups()
+        if literal:
+            raise ValueError("literal inside IMAP list")
+        if opened:
+            stack.append([])
+            continue
+        if closed:
+            done = stack.pop()
+            if not stack:
+                return done, pos
+            stack[-1].append(done)
+            continue
+        if not stack:
+            raise ValueError("expected IMAP list")
+        if quoted is not None:
+            stack[-1].append(re.sub(rb'\\(.)', rb'\1', quoted).decode("utf-8", "replace"))
+        else:
+            stack[-1].append(None if atom.upper() == b"NIL" else atom.decode("ascii", "replace"))
+
+
+def _parse_bodystructure(text):
+    """Extract and parse the BODYSTRUCTURE list from a FETCH response."""
+    start = text.find(b"BODYSTRUCTURE (")
+    if start == -1:
+        raise ValueError("no BODYSTRUCTURE in response")
+    structure, _ = _parse_sexp(text, start + len(b"BODYSTRUCTURE "))
+    return structure
+
+
+def _find_text_part(structure, section=""):
+    """
+    Locate the part extract_email_body() would use.
+    
+    Returns (section, transfer encoding, charset), or None if a multipart
+    message has no non-attachment text/plain part.
+    """
+    if structure and isinstance(structure[0], list):
+        # multipart: subparts first, then the subtype and extension data
+        for index, part in enumerate(structure, 1):
+            if not isinstance(part, list):
+                break
+            if isinstance(part[0], list):
+                found = _find_text_part(part, f"{section}{index}.")
+            else:
+                found = _single_part(part, f"{section}{index}", multipart=True)
+            if found is not None:
+                return found
+        return None
+    # A non-multipart message is section 1, whatever its type
+    return _single_part(structure, "1", multipart=False)
+
+
+def _single_part(part, section, multipart):
+    """Return (section, encoding, charset) if this single part holds the body."""
+    content_type = f"{part[0] or ''}/{part[1] or ''}".lower()
+    params = part[2] if len(part) > 2 and isinstance(part[2], list) else []
+    values = dict(zip(params[::2], params[1::2]))
+    charset = next((v for k, v in values.items() if k and k.lower() == "charset"), None)
+    encoding = part[5] if len(part) > 5 else None
+    if multipart:
+        if content_type != "text/plain":
+            return None
+        # text parts: type subtype params id desc encoding size lines md5 disposition
+        disposition = part[9] if len(part) > 9 and isinstance(part[9], list) else None
+        if disposition and disposition[0] and disposition[0].lower() == "attachment":
+            return None
+    return section, encoding, charset
+
+
+def _decode_part(raw, encoding, charset):
+    """Undo the transfer encoding and charset like extract_email_body()."""
+    def full_decode():
+        part = Message()
+        if encoding:
+            part["Content-Transfer-Encoding"] = encoding
+        part.set_payload(raw)
+        return part.get_payload(decode=True) or b""
+    return _decode_payload(raw, encoding, charset, full_decode)
+
+
+def _payload_chunks(payload):
+    """Yield a transfer-encoded (ASCII) str/bytes payload as bytes chunks."""
+    for start in range(0, len(payload), _DECODE_CHUNK_SIZE):
+        chunk = payload[start:start + _DECODE_CHUNK_SIZE]
+        yield chunk.encode("ascii") if isinstance(chunk, str) else chunk
+
+
+def _transfer_decode(chunks, encoding):
+    """Undo base64 or quoted-printable chunk by chunk."""
+    if encoding == "base64":
+        carry = b""
+        for chunk in chunks:
+            data = carry + _NON_BASE64_RE.sub(b"", chunk)
+            usable = len(data) - len(data) % 4
+            carry = data[usable:]
+            if usable:
+                yield binascii.a2b_base64(data[:usable])
+        if len(carry) == 1:
+            raise binascii.Error("truncated base64 data")
+        if carry:
+            # Tolerate missing padding at the very end, like the email package
+            yield binascii.a2b_base64(carry + b"=" * (-len(carry) % 4))
+    elif encoding == "quoted-printable":
+        carry = b""
+        for chunk in chunks:
+            # Only decode complete lines so soft line breaks ("=\n") are never split
+            data = carry + chunk
+            cut = data.rfind(b"\n") + 1
+            carry = data[cut:]
+            if cut:
+                yield quopri.decodestring(data[:cut])
+        if carry:
+            yield quopri.decodestring(carry)
+
+
+def _decode_payload(payload, encoding, charset, full_decode):
+    """
+    Incrementally decode a text payload to str.
+    
+    For base64 and quoted-printable bodies, transfer decoding and charset
+    decoding run chunk by chunk, so the whole decoded byte string never has
+    to exist next to the final text. Other transfer encodings (and payloads
+    that are not clean ASCII) use full_decode(), which returns the whole
+    decoded bytes. Unknown charsets fall back to UTF-8.
+    """
+    encoding = (encoding or "7bit").strip().lower()
+    try:
+        decoder = codecs.getincrementaldecoder(charset.lower() if charset else "utf-8")(errors="replace")
+    except LookupError:
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    
+    if encoding not in ("base64", "quoted-printable") or not isinstance(payload, (str, bytes)):
+        return decoder.decode(full_decode(), final=True)
+    try:
+        pieces = [decoder.decode(data) for data in _transfer_decode(_payload_chunks(payload), encoding)]
+    except (binascii.Error, UnicodeEncodeError):
+        decoder.reset()
+        return decoder.decode(full_decode(), final=True)
+    pieces.append(decoder.decode(b"", final=True))
+    return "".join(pieces)
+
+
+def _fetch_each(mail, email_ids):
+    """Fetch messages one UID FETCH at a time; returns {uid: raw bytes}."""
+    raw_emails = {}
+    total = len(email_ids)
+    for i, num in enumerate(email_ids, 1):
+        uid = num.decode()
+        logger.debug("Fetching email %s/%s (ID: %s)", i, total, uid)
+        try:
+            status, msg_data = mail.uid("fetch", num, "(RFC822)")
+        except Exception as e:
+            logger.error("Error fetching email %s: %s", uid, e)
+            continue
+        if status != 'OK':
+            logger.warning("Failed to fetch email %s: %s", uid, msg_data)
+            continue
+        if msg_data and msg_data[0]:
+            raw_emails[num] = msg_data[0][1]
+    return raw_emails
+
+
+def _parse_email(num, raw_email):
+    """Parse one raw RFC822 message into the email dict returned by fetch_imap_emails."""
+    uid = num.decode()
+    msg = _PARSER.parsebytes(raw_email)
+    subject = _decode_subject(msg)
+    
+    # Extract email body
+    try:
+        body = extract_email_body(msg)
+    except Exception as e:
+        logger.warning("Error extracting body for email %s: %s", uid, e)
+        body = "Error extracting email body"
+    
+    return {
+        "id": uid,
+        "from": msg.get("From", "Unknown"),
+        "subject": subject,
+        "body": body
+    }
+
+
+def _decode_subject(msg):
+    """Decode a message's Subject header."""
+    raw_subject = msg.get("Subject")
+    if not raw_subject:
+        return "No Subject"
+    if "=?" not in raw_subject:
+        # No RFC 2047 encoded-words, so decode_header() would return it unchanged
+        return raw_subject
+    return _decode_mime_words(raw_subject)
+
+
+def _decode_mime_words(raw_subject):
+    """Decode an RFC 2047 encoded Subject value."""
+    subject = raw_subject
+    try:
+        decoded_subject = decode_header(raw_subject)
+        if decoded_subject and decoded_subject[0]:
+            subject, encoding = decoded_subject[0]
+            if isinstance(subject, bytes):
+                subject = subject.decode(encoding if encoding else "utf-8")
+    except Exception as e:
+        logger.warning("Error decoding subject: %s", e)
+        subject = raw_subject
+    return subject
+
 
 def extract_email_body(msg):
     if msg.is_multipart(): # The email body may be in multiple parts
@@ -148,8 +598,16 @@ def extract_email_body(msg):
             content_type = part.get_content_type()
             content_disposition = str(part.get("Content-Disposition"))
             if content_type == "text/plain" and "attachment" not in content_disposition:
-                charset = part.get_content_charset() or "utf-8"
-                return part.get_payload(decode=True).decode(charset, errors="replace")
+                return _decode_message_text(part)
     else:
-        charset = msg.get_content_charset() or "utf-8"
-        return msg.get_payload(decode=True).decode(charset, errors="replace")
+        return _decode_message_text(msg)
+
+
+def _decode_message_text(part):
+    """Decode a parsed (non-multipart) part's payload to text."""
+    return _decode_payload(
+        part.get_payload(decode=False),
+        part.get("Content-Transfer-Encoding"),
+        part.get_content_charset(),
+        lambda: part.get_payload(decode=True) or b""
+    )
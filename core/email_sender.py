@@ -1,4 +1,12 @@
+import asyncio
+import atexit
+import queue
 import smtplib
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from typing import Iterator
 from email.mime.text import MIMEText
 from config import EMAIL_SERVER, EMAIL_PASSWORD, EMAIL_USERNAME, EMAIL_PORT
 from email.message import EmailMessage
@@ -39,6 +47,195 @@ also change the for loop for the main function to -
 
 logger = get_logger(__name__)
 
+# Per-message rejections after which the session is still in a clean state
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused, smtplib.SMTPDataError)
+
+
+class _SMTPSession:
+    """One authenticated SMTP connection plus its usage bookkeeping."""
+
+    def __init__(self, conn: smtplib.SMTP):
+        self.conn = conn
+        self.last_used = time.monotonic()
+        self.sent = 0
+
+
+class SMTPPool:
+    """
+    Keeps up to MAX_SESSIONS authenticated SMTP sessions per
+    (server, port, username) open across sends, so STARTTLS and LOGIN are
+    paid once per session instead of per email. Idle sessions are probed
+    with NOOP and transparently re-opened when the server has dropped them;
+    a session is retired after MAX_MESSAGES_PER_SESSION messages.
+    """
+
+    # Seconds a session may sit idle before it is health-checked with NOOP
+    KEEPALIVE_INTERVAL = 60
+    # Simultaneous sessions per account (also the number kept idle)
+    MAX_SESSIONS = 5
+    # Messages sent before a session is replaced with a fresh one
+    MAX_MESSAGES_PER_SESSION = 100
+    # Seconds to wait for the connection and for each server reply
+    TIMEOUT = 30
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, server: str, port: int, username: str, password: str):
+        self.server = server
+        self.port = int(port)
+        self.username = username
+        self.password = password
+        self._idle = queue.LifoQueue(maxsize=self.MAX_SESSIONS)
+        self._slots = threading.BoundedSemaphore(self.MAX_SESSIONS)
+        self._closed = False
+
+    @classmethod
+    def get(cls, server: str, port, username: str, password: str) -> "SMTPPool":
+        """Return the shared pool for these credentials, creating it on first use."""
+        key = (server, int(port), username)
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None or pool.password != password:
+                if pool is not None:
+                    pool.close()
+                pool = cls(server, port, username, password)
+                cls._pools[key] = pool
+            return pool
+
+    @classmethod
+    def close_all(cls):
+        """Close every pooled session (registered with atexit)."""
+        with cls._pools_lock:
+            for pool in cls._pools.values():
+                pool.close()
+            cls._pools.clear()
+
+    def _connect(self) -> _SMTPSession:
+        logger.debug("Connecting to SMTP server %s:%s", self.server, self.port)
+        conn = smtplib.SMTP(self.server, self.port, timeout=self.TIMEOUT)
+        try:
+            # Keepalive lets idle pooled sessions survive NAT/firewall timeouts
+            conn.sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            logger.debug("Starting TLS...")
+            conn.starttls()
+            logger.debug("Logging in as %s", self.username)
+            conn.login(self.username, self.password)
+        except Exception:
+            conn.close()
+            raise
+        return _SMTPSession(conn)
+
+    def _checkout(self) -> _SMTPSession:
+        """Take a live idle session, or open a new one."""
+        while True:
+            try:
+                session = self._idle.get_nowait()
+            except queue.Empty:
+                return self._connect()
+            if time.monotonic() - session.last_used <= self.KEEPALIVE_INTERVAL:
+                return session
+            try:
+                status, _ = session.conn.noop()
+                if status == 250:
+                    return session
+            except OSError:  # includes smtplib.SMTPException
+                pass
+            self._discard(session)
+
+    def _checkin(self, session: _SMTPSession):
+        """Return a session to the idle queue, or close it if it has been used up."""
+        session.last_used = time.monotonic()
+        if self._closed or session.sent >= self.MAX_MESSAGES_PER_SESSION:
+            self._quit(session)
+            return
+        try:
+            self._idle.put_nowait(session)
+        except queue.Full:
+            self._quit(session)
+
+    @staticmethod
+    def _discard(session: _SMTPSession):
+        try:
+            session.conn.close()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _quit(session: _SMTPSession):
+        try:
+            session.conn.quit()
+        except Exception:
+            pass
+
+    @contextmanager
+    def acquire(self) -> Iterator[smtplib.SMTP]:
+        """
+        Borrow an authenticated session for the duration of the block.
+
+        Waits while MAX_SESSIONS sessions are already in use. The session
+        is returned to the pool afterwards, unless the block raised, in
+        which case it is closed; a message the server refused (smtplib
+        resets the transaction) leaves the session usable.
+        """
+        with self._slots:
+            session = self._checkout()
+            try:
+                yield session.conn
+            except _MESSAGE_ERRORS:
+                self._checkin(session)
+                raise
+            except BaseException:
+                self._discard(session)
+                raise
+            session.sent += 1
+            self._checkin(session)
+
+    def send(self, msg: EmailMessage):
+        """Send one message over a pooled session, reconnecting once on disconnect."""
+        try:
+            with self.acquire() as conn:
+                conn.send_message(msg)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            logger.debug("SMTP session dropped, reconnecting")
+            with self.acquire() as conn:
+                conn.send_message(msg)
+
+    def send_many(self, msgs) -> list:
+        """
+        Send several messages over the pooled sessions.
+
+        Returns:
+            List of booleans, one per message, True if it was sent
+        """
+        results = []
+        for msg in msgs:
+            try:
+                self.send(msg)
+                results.append(True)
+            except Exception as e:
+                logger.error("Failed to send email to %s: %s", msg.get("To"), e)
+                results.append(False)
+        return results
+
+    async def asend_many(self, msgs) -> list:
+        """Async wrapper around send_many(); the blocking SMTP I/O runs in a worker thread."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.send_many, list(msgs))
+
+    def close(self):
+        """Quit every idle session; sessions currently in use close when released."""
+        self._closed = True
+        while True:
+            try:
+                self._quit(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+
+atexit.register(SMTPPool.close_all)
+
+
 def extract_name_from_email(email_address: str) -> str:
     """
     Extracts the portion before the '@' as a friendly name.
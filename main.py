@@ -35,7 +35,7 @@ def main():
     
     # Use IMAP to fetch live emails
     emails = fetch_imap_emails(IMAP_USERNAME, IMAP_PASSWORD, IMAP_SERVER)
-    logger.debug(f"Fetched {len(emails)} emails from IMAP.")
+    logger.debug("Fetched %s emails from IMAP.", len(emails))
     
     if not emails:
         logger.info("No emails found.")
@@ -73,7 +73,7 @@ def main():
     process_email_action(selected_email, your_name)
     
     logger.info("All emails processed.")
-    logger.debug(f"Final State: {state}")
+    logger.debug("Final State: %s", state)
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,13 @@
+from agents.resume_analysis_agent import extract_analysis_manually
+
+
+def test_overlapping_level_keywords():
+    # "Mid-senior" contains "senior"; both levels must be seen, and Senior ranks higher
+    assert extract_analysis_manually("Level: Mid-senior engineer")["position_level"] == "Senior"
+    assert extract_analysis_manually("Level: mid level")["position_level"] == "Mid-level"
+    assert extract_analysis_manually("Team leader with junior reports")["position_level"] == "Lead"
+
+
+if __name__ == "__main__":
+    test_overlapping_level_keywords()
+    print("Resume analysis level tests passed!")
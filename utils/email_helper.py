@@ -3,6 +3,8 @@ Helper functions for sending emails with dynamic credentials.
 """
 import smtplib
 from email.message import EmailMessage
+from typing import List
+from core.email_sender import SMTPPool
 from utils.logger import get_logger
 from utils.formatter import format_email
 
@@ -48,18 +50,57 @@ def send_email_with_credentials(
         msg["To"] = recipient_email
         msg.set_content(formatted_content)
         
-        logger.debug(f"Connecting to SMTP server {smtp_server}:{smtp_port}")
-        with smtplib.SMTP(smtp_server, int(smtp_port)) as server:
-            logger.debug("Starting TLS...")
-            server.starttls()
-            logger.debug(f"Logging in as {smtp_username}")
-            server.login(smtp_username, smtp_password)
-            logger.debug(f"Sending email to {recipient_email}")
-            server.send_message(msg)
-            logger.info(f"Email sent successfully to {recipient_email}")
+        # Reuse a pooled, already-authenticated SMTP session for these credentials;
+        # a new one is opened only if the server dropped it
+        logger.debug("Sending email to %s", recipient_email)
+        SMTPPool.get(smtp_server, smtp_port, smtp_username, smtp_password).send(msg)
+        logger.info("Email sent successfully to %s", recipient_email)
         
         return True
     except Exception as e:
-        logger.error(f"Failed to send email: {e}")
+        logger.error("Failed to send email: %s", e)
         return False
 
+
+def send_emails_batch(
+    messages: List[EmailMessage],
+    smtp_username: str,
+    smtp_password: str,
+    smtp_server: str,
+    smtp_port: str
+) -> List[bool]:
+    """
+    Send several prepared messages back-to-back over the pooled SMTP session.
+    
+    The batch is aborted once a third of the messages have failed (a bad
+    login, a rate limit or a rejecting server would fail the rest anyway);
+    messages not attempted are reported as not sent.
+    
+    Args:
+        messages: Messages to send (Subject/From/To already set)
+        smtp_username: SMTP username/email
+        smtp_password: SMTP password/app password
+        smtp_server: SMTP server address
+        smtp_port: SMTP port number
+        
+    Returns:
+        List of booleans, one per message, True if it was sent
+    """
+    pool = SMTPPool.get(smtp_server, smtp_port, smtp_username, smtp_password)
+    results = []
+    failures = 0
+    for msg in messages:
+        if failures * 3 >= len(messages) and failures:
+            logger.error("Aborting batch after %s failed sends", failures)
+            break
+        try:
+            # The pool hands back the same live session each time, so the
+            # whole batch shares one STARTTLS + LOGIN
+            pool.send(msg)
+            results.append(True)
+        except (smtplib.SMTPException, OSError) as e:
+            logger.error("Failed to send email to %s: %s", msg.get('To'), e)
+            results.append(False)
+            failures += 1
+    results.extend([False] * (len(messages) - len(results)))
+    return results
@@ -2,10 +2,36 @@
 Utility module for extracting text from various file formats.
 Supports PDF, Word (.docx), and plain text files.
 """
+import io
 import os
-from typing import Optional
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import BinaryIO, List, Optional, Tuple, Union
 from pathlib import Path
 
+# PDF backends in order of preference: PDFium and MuPDF parse in native
+# code and are much faster than the pure-Python pypdf fallback
+try:
+    import pypdfium2 as pdfium
+    PDFIUM_AVAILABLE = True
+except ImportError:
+    PDFIUM_AVAILABLE = False
+    pdfium = None
+
+try:
+    import pymupdf
+    PYMUPDF_AVAILABLE = True
+except ImportError:
+    try:
+        import fitz as pymupdf  # PyMuPDF < 1.24
+        PYMUPDF_AVAILABLE = True
+    except ImportError:
+        PYMUPDF_AVAILABLE = False
+        pymupdf = None
+
 try:
     from pypdf import PdfReader
     PYPDF_AVAILABLE = True
@@ -18,59 +44,216 @@ try:
 except ImportError:
     Document = None
 
+# lxml (installed with python-docx) parses faster than the stdlib fallback
+try:
+    from lxml.etree import iterparse as _lxml_iterparse
+    LXML_AVAILABLE = True
+except ImportError:
+    from xml.etree.ElementTree import iterparse as _etree_iterparse
+    LXML_AVAILABLE = False
+
+_W_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+_W_P = _W_NS + "p"
+_W_R = _W_NS + "r"
+_W_T = _W_NS + "t"
+_W_TAB = _W_NS + "tab"
+_W_BR = _W_NS + "br"
+_W_CR = _W_NS + "cr"
+_W_TXBX = _W_NS + "txbxContent"
+
+# PDFs with more pages than this have the rest extracted in worker processes
+PDF_PARALLEL_MIN_PAGES = 32
+
+# PDFium and MuPDF are not thread-safe, even across documents, so threads in one
+# process take turns (worker processes each have their own library instance and lock)
+_NATIVE_PDF_LOCK = threading.Lock()
 
-def extract_text_from_pdf(file_path: str) -> str:
+
+def extract_text_from_pdf(file_path: Union[str, BinaryIO]) -> str:
     """
     Extract text from a PDF file.
     
+    Uses the first available backend: pypdfium2, then PyMuPDF, then pypdf.
+    
     Args:
-        file_path: Path to the PDF file
+        file_path: Path to the PDF file, or a binary file object
         
     Returns:
         Extracted text as a string
         
     Raises:
-        ValueError: If pypdf is not installed or file cannot be read
+        ValueError: If no PDF library is installed or file cannot be read
     """
-    if not PYPDF_AVAILABLE:
-        raise ValueError("pypdf is not installed. Please install it using: pip install pypdf")
+    backend = _pdf_backend()
+    if backend is None:
+        raise ValueError("No PDF library is installed. Please install one using: pip install pypdfium2 (or pymupdf, or pypdf)")
     
-    text = ""
     try:
-        pdf_reader = PdfReader(file_path)
-        for page in pdf_reader.pages:
-            text += page.extract_text() + "\n"
+        # Paths and bytes can be re-opened in worker processes; file objects cannot
+        source = file_path if isinstance(file_path, str) else file_path.read()
+        # The first pages are read here, which also yields the page count;
+        # only long documents spread the remaining pages across processes
+        page_count, pages = _PDF_BACKENDS[backend](source, 0, PDF_PARALLEL_MIN_PAGES)
+        if page_count > PDF_PARALLEL_MIN_PAGES:
+            pages += _pdf_pages_parallel(backend, source, PDF_PARALLEL_MIN_PAGES, page_count)
     except Exception as e:
         raise ValueError(f"Error reading PDF file: {str(e)}")
     
-    return text.strip()
+    # Collect pages and join once instead of re-copying the text per page
+    return "\n".join(pages).strip()
+
+
+def _pdf_backend() -> Optional[str]:
+    """Name of the preferred installed PDF backend."""
+    if PDFIUM_AVAILABLE:
+        return "pdfium"
+    if PYMUPDF_AVAILABLE:
+        return "pymupdf"
+    if PYPDF_AVAILABLE:
+        return "pypdf"
+    return None
+
 
+def _pdf_pages_pdfium(source: Union[str, bytes], start: int = 0, stop: Optional[int] = None) -> Tuple[int, List[str]]:
+    """Page count and the texts of pages [start, stop) via PDFium."""
+    with _NATIVE_PDF_LOCK:
+        pdf = pdfium.PdfDocument(source)
+        try:
+            page_count = len(pdf)
+            pages = []
+            for index in range(start, min(stop or page_count, page_count)):
+                page = pdf[index]
+                textpage = page.get_textpage()
+                # PDFium ends lines with CRLF; normalize to match the other backends
+                pages.append(textpage.get_text_range().replace("\r\n", "\n"))
+                textpage.close()
+                page.close()
+            return page_count, pages
+        finally:
+            pdf.close()
+
+
+def _pdf_pages_pymupdf(source: Union[str, bytes], start: int = 0, stop: Optional[int] = None) -> Tuple[int, List[str]]:
+    """Page count and the texts of pages [start, stop) via MuPDF."""
+    with _NATIVE_PDF_LOCK:
+        if isinstance(source, str):
+            doc = pymupdf.open(source)
+        else:
+            doc = pymupdf.open(stream=source, filetype="pdf")
+        with doc:
+            page_count = doc.page_count
+            return page_count, [doc[index].get_text() for index in range(start, min(stop or page_count, page_count))]
+
+
+def _pdf_pages_pypdf(source: Union[str, bytes], start: int = 0, stop: Optional[int] = None) -> Tuple[int, List[str]]:
+    """Page count and the texts of pages [start, stop) via pypdf."""
+    pdf_reader = PdfReader(source if isinstance(source, str) else io.BytesIO(source))
+    page_count = len(pdf_reader.pages)
+    return page_count, [pdf_reader.pages[index].extract_text() or ""
+                        for index in range(start, min(stop or page_count, page_count))]
+
+
+_PDF_BACKENDS = {
+    "pdfium": _pdf_pages_pdfium,
+    "pymupdf": _pdf_pages_pymupdf,
+    "pypdf": _pdf_pages_pypdf,
+}
+
+
+def _pdf_page_range(args: Tuple[str, Union[str, bytes], int, int]) -> List[str]:
+    """Worker-process entry point: texts of one page range (the document is re-opened)."""
+    backend, source, start, stop = args
+    return _PDF_BACKENDS[backend](source, start, stop)[1]
 
-def extract_text_from_docx(file_path: str) -> str:
+
+def _pdf_pages_parallel(backend: str, source: Union[str, bytes], start: int, stop: int) -> List[str]:
+    """Texts of pages [start, stop), split into one contiguous range per CPU."""
+    workers = min(os.cpu_count() or 1, stop - start)
+    if workers > 1:
+        step = -(-(stop - start) // workers)
+        ranges = [(backend, source, lo, min(lo + step, stop)) for lo in range(start, stop, step)]
+        try:
+            with ProcessPoolExecutor(max_workers=len(ranges)) as executor:
+                return [text for chunk in executor.map(_pdf_page_range, ranges) for text in chunk]
+        except (BrokenProcessPool, OSError):
+            # Process creation is not available everywhere; read sequentially instead
+            pass
+    return _PDF_BACKENDS[backend](source, start, stop)[1]
+
+
+def extract_text_from_docx(file_path: Union[str, BinaryIO]) -> str:
     """
     Extract text from a Word document (.docx file).
     
     Args:
-        file_path: Path to the .docx file
+        file_path: Path to the .docx file, or a binary file object
         
     Returns:
         Extracted text as a string
         
     Raises:
-        ValueError: If python-docx is not installed or file cannot be read
+        ValueError: If the file cannot be read
     """
-    if Document is None:
-        raise ValueError("python-docx is not installed. Please install it using: pip install python-docx")
-    
     try:
-        doc = Document(file_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        # Stream word/document.xml instead of building python-docx's object model
+        text = "\n".join(_docx_paragraphs(file_path))
     except Exception as e:
-        raise ValueError(f"Error reading DOCX file: {str(e)}")
+        if Document is None:
+            raise ValueError(f"Error reading DOCX file: {str(e)}")
+        if not isinstance(file_path, str):
+            file_path.seek(0)
+        try:
+            doc = Document(file_path)
+            text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        except Exception as e:
+            raise ValueError(f"Error reading DOCX file: {str(e)}")
     
     return text.strip()
 
 
+def _docx_paragraphs(source: Union[str, BinaryIO]) -> List[str]:
+    """
+    Text of the body paragraphs of a .docx, like python-docx's doc.paragraphs
+    (tables and text boxes are skipped, tabs and line breaks kept).
+    """
+    paragraphs = []
+    with zipfile.ZipFile(source) as archive, archive.open("word/document.xml") as xml:
+        if LXML_AVAILABLE:
+            events = _lxml_iterparse(xml, events=("start", "end"), resolve_entities=False)
+        else:
+            events = _etree_iterparse(xml, events=("start", "end"))
+        stack = []  # tags of the open elements: w:document, w:body, ...
+        parts = None  # text pieces of the body paragraph being read
+        in_textbox = 0
+        for event, element in events:
+            tag = element.tag
+            if event == "start":
+                stack.append(tag)
+                if tag == _W_P and len(stack) == 3:
+                    parts = []
+                elif tag == _W_TXBX:
+                    in_textbox += 1
+                continue
+            
+            stack.pop()
+            if tag == _W_TXBX:
+                in_textbox -= 1
+            elif parts is not None and not in_textbox and stack and stack[-1] == _W_R:
+                if tag == _W_T:
+                    parts.append(element.text or "")
+                elif tag == _W_TAB:
+                    parts.append("\t")
+                elif tag == _W_CR or (tag == _W_BR and element.get(_W_NS + "type", "textWrapping") == "textWrapping"):
+                    parts.append("\n")
+            if len(stack) == 2:
+                # Finished a direct child of w:body; its subtree is no longer needed
+                if tag == _W_P:
+                    paragraphs.append("".join(parts))
+                    parts = None
+                element.clear()
+    return paragraphs
+
+
 def extract_text_from_txt(file_path: str) -> str:
     """
     Extract text from a plain text file.
@@ -128,3 +311,61 @@ def extract_text_from_file(file_path: str) -> str:
     else:
         raise ValueError(f"Unsupported file type: {file_extension}. Supported types: .pdf, .docx, .txt")
 
+
+def extract_text_from_bytes(data: bytes, suffix: str) -> str:
+    """
+    Extract text from in-memory file contents (e.g. an upload), without
+    writing them to disk first.
+    
+    Args:
+        data: Raw file contents
+        suffix: File extension identifying the format (e.g. ".pdf")
+        
+    Returns:
+        Extracted text as a string
+        
+    Raises:
+        ValueError: If file type is not supported or data cannot be read
+    """
+    file_extension = suffix.lower()
+    
+    if file_extension == '.pdf':
+        return extract_text_from_pdf(io.BytesIO(data))
+    elif file_extension in ['.docx', '.doc']:
+        return extract_text_from_docx(io.BytesIO(data))
+    elif file_extension == '.txt':
+        try:
+            text = data.decode('utf-8')
+        except UnicodeDecodeError:
+            # Try with different encoding
+            text = data.decode('latin-1')
+        return text.strip()
+    else:
+        raise ValueError(f"Unsupported file type: {file_extension}. Supported types: .pdf, .docx, .txt")
+
+
+@lru_cache(maxsize=256)
+def _extract_cached(file_path: str, mtime_ns: int, size: int) -> str:
+    """Memoized extraction; mtime and size are part of the key so edits invalidate it."""
+    return extract_text_from_file(file_path)
+
+
+def extract_text_from_file_cached(file_path: str) -> str:
+    """
+    Like extract_text_from_file, but reuses the text of a file that has not
+    changed since it was last extracted (same path, mtime and size).
+    
+    Args:
+        file_path: Path to the file
+        
+    Returns:
+        Extracted text as a string
+        
+    Raises:
+        ValueError: If file type is not supported or file cannot be read
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
+        raise ValueError(f"File not found: {file_path}")
+    return _extract_cached(os.path.abspath(file_path), stat.st_mtime_ns, stat.st_size)
@@ -1,5 +1,3 @@
-from jinja2 import Template
-
 def clean_text(text: str)-> str:
     """Remove extra whitespace and unwanted newlines."""
     return " ".join(text.split())
@@ -12,14 +10,14 @@ def format_email(subject: str, sender_name: str, body: str, user_name: str) -> s
     cleaned_body = body.strip()
     
     # Remove a leading "Subject:" header if present
-    if cleaned_body.lower().startswith("subject:"):
-        lines = cleaned_body.splitlines()
-        cleaned_body = "\n".join(lines[1:]).strip()
+    # (only the prefix is lowercased, not the whole body)
+    if cleaned_body[:8].lower() == "subject:":
+        cleaned_body = cleaned_body.partition("\n")[2].strip()
     
     # Remove duplicate signature if it already exists in the body.
     signature_marker = "Best regards,"
     if signature_marker in cleaned_body:
-        cleaned_body = cleaned_body.split(signature_marker)[0].strip()
+        cleaned_body = cleaned_body.partition(signature_marker)[0].strip()
     
     formatted_email = (
         f"Subject: Re: {cleaned_subject}\n\n"
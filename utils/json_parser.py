@@ -0,0 +1,143 @@
+"""
+Utility module for pulling JSON objects out of free-form LLM output.
+Uses orjson when it is installed and falls back to the standard library.
+"""
+import json
+import re
+from typing import Any, Optional
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+# Only these characters can change brace depth or string state
+_JSON_TOKEN_RE = re.compile(r'[{}"\\]')
+
+
+def extract_json_object(text: str) -> Optional[str]:
+    """
+    Return the first balanced top-level {...} object in text.
+
+    Single forward scan that tracks brace depth and string literals (with
+    backslash escapes), so braces inside strings are ignored and trailing
+    commentary after the object is never scanned.
+
+    Args:
+        text: Text that may contain a JSON object
+
+    Returns:
+        The JSON object substring, or None if no balanced object is found
+    """
+    start = text.find('{')
+    if start == -1:
+        return None
+
+    depth = 0
+    in_string = False
+    pos = start
+    while True:
+        match = _JSON_TOKEN_RE.search(text, pos)
+        if match is None:
+            return None
+        char = match.group()
+        pos = match.end()
+        if in_string:
+            if char == '\\':
+                pos += 1  # skip the escaped character
+            elif char == '"':
+                in_string = False
+        elif char == '"':
+            in_string = True
+        elif char == '{':
+            depth += 1
+        elif char == '}':
+            depth -= 1
+            if depth == 0:
+                return text[start:pos]
+
+
+class JSONObjectScanner:
+    """
+    Incremental version of extract_json_object() for streamed text.
+
+    Feed chunks as they arrive; feed() returns the complete object as soon as
+    its closing brace is seen, so callers can stop consuming the stream.
+    """
+
+    def __init__(self):
+        self._text = ""
+        self._start = -1
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+
+    def feed(self, chunk: str) -> Optional[str]:
+        """
+        Add a chunk of text.
+
+        Returns:
+            The first balanced top-level {...} object once complete, else None
+        """
+        self._text += chunk
+        text = self._text
+        if self._start == -1:
+            self._start = text.find('{', self._pos)
+            if self._start == -1:
+                self._pos = len(text)
+                return None
+            self._pos = self._start
+
+        pos = self._pos
+        if self._escape:
+            # A backslash ended the previous chunk; skip the escaped character
+            if pos >= len(text):
+                return None
+            pos += 1
+            self._escape = False
+        while True:
+            match = _JSON_TOKEN_RE.search(text, pos)
+            if match is None:
+                self._pos = len(text)
+                return None
+            char = match.group()
+            pos = match.end()
+            if self._in_string:
+                if char == '\\':
+                    if pos >= len(text):
+                        self._pos = pos
+                        self._escape = True
+                        return None
+                    pos += 1
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == '{':
+                self._depth += 1
+            elif char == '}':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._pos = pos
+                    return text[self._start:pos]
+
+    @property
+    def text(self) -> str:
+        """All text fed so far."""
+        return self._text
+
+
+def loads(data: str) -> Any:
+    """
+    Parse a JSON document with orjson if available, else the stdlib parser.
+
+    Raises:
+        json.JSONDecodeError: If data is not valid JSON
+    """
+    if ORJSON_AVAILABLE:
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError
+        return orjson.loads(data)
+    return json.loads(data)
@@ -0,0 +1,72 @@
+"""
+Utility module for caching the results of LLM-backed functions.
+Repeated calls with the same input (retries, re-runs, re-uploaded
+resumes) are answered from memory instead of another LLM round-trip.
+"""
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Optional
+
+
+def _digest(*parts: Any) -> str:
+    """Stable hash of the given values."""
+    hasher = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        hasher.update(repr(part).encode("utf-8", "surrogatepass"))
+        hasher.update(b"\x00")
+    return hasher.hexdigest()
+
+
+def llm_cached(ttl: int = 86400, maxsize: int = 1024, key: Optional[Callable[..., Any]] = None):
+    """
+    Decorator caching a function's results in an in-memory LRU with expiry.
+
+    Exceptions are not cached. Cached values are deep-copied on the way out
+    so callers can mutate the returned dict/list freely.
+
+    Args:
+        ttl: Seconds before a cached result expires
+        maxsize: Maximum number of cached results (least recently used evicted)
+        key: Optional function mapping the call arguments to the value that
+            identifies the request (defaults to all arguments)
+
+    Returns:
+        Decorator; the wrapped function also exposes cache_clear()
+    """
+    def decorator(func: Callable) -> Callable:
+        entries: "OrderedDict[str, tuple]" = OrderedDict()
+        lock = threading.Lock()
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            identity = key(*args, **kwargs) if key is not None else (args, sorted(kwargs.items()))
+            cache_key = _digest(func.__module__, func.__qualname__, identity)
+            now = time.monotonic()
+
+            with lock:
+                entry = entries.get(cache_key)
+                if entry is not None and entry[0] > now:
+                    entries.move_to_end(cache_key)
+                    return copy.deepcopy(entry[1])
+
+            result = func(*args, **kwargs)
+
+            with lock:
+                entries[cache_key] = (now + ttl, copy.deepcopy(result))
+                entries.move_to_end(cache_key)
+                while len(entries) > maxsize:
+                    entries.popitem(last=False)
+            return result
+
+        def cache_clear():
+            with lock:
+                entries.clear()
+
+        wrapper.cache_clear = cache_clear
+        return wrapper
+
+    return decorator
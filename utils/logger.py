@@ -1,17 +1,43 @@
 # utils/logger.py
 import logging
 import os
+import re
+import threading
+from functools import lru_cache
+from typing import Dict, Optional, Pattern, Tuple
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def _configure_root_handler():
+    """
+    Install one shared handler/formatter on the root logger (once).
+    
+    Module loggers propagate to it instead of each owning a handler. The
+    root level is left alone, so third-party libraries stay at WARNING
+    while the project's loggers (set to DEBUG in get_logger) log everything.
+    An application that already configured the root logger keeps its setup.
+    """
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        root = logging.getLogger()
+        if not root.handlers:
+            handler = logging.StreamHandler()
+            handler.setFormatter(logging.Formatter(
+                '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+            ))
+            root.addHandler(handler)
+        _configured = True
+
 
 def get_logger(name: str) -> logging.Logger:
+    if not _configured:
+        _configure_root_handler()
     logger = logging.getLogger(name)
-    if not logger.handlers:
-        logger.setLevel(logging.DEBUG)
-        handler = logging.StreamHandler()
-        formatter = logging.Formatter(
-            '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-        )
-        handler.setFormatter(formatter)
-        logger.addHandler(handler)
+    logger.setLevel(logging.DEBUG)
     return logger
 
 
@@ -27,20 +53,30 @@ def sanitize_error_message(error_msg: str, sensitive_keys: list = None) -> str:
         Sanitized error message with sensitive information replaced with ***
     """
     if sensitive_keys is None:
-        # Get sensitive keys from environment variables
-        sensitive_keys = []
-        for key in ['GEMINI_API_KEY', 'GOOGLE_API_KEY', 'DEEPSEEK_API_KEY', 
-                   'OPENAI_API_KEY', 'EMAIL_PASSWORD', 'IMAP_PASSWORD', 
-                   'ADMIN_PASSWORD']:
-            value = os.getenv(key)
-            if value:
-                sensitive_keys.append(value)
-    
-    sanitized = str(error_msg)
-    for key in sensitive_keys:
-        if key and len(key) > 4:  # Only mask keys longer than 4 chars
-            # Mask the key but keep first 4 and last 4 chars for debugging
-            masked = key[:4] + "***" + key[-4:] if len(key) > 8 else "***"
-            sanitized = sanitized.replace(key, masked)
+        # Get sensitive keys from environment variables (read on each call,
+        # since .env may be loaded after this module is imported)
+        sensitive_keys = [os.environ.get(key) for key in _SENSITIVE_ENV_KEYS]
     
-    return sanitized
+    pattern, masks = _secret_pattern(tuple(sensitive_keys))
+    if pattern is None:
+        return str(error_msg)
+    return pattern.sub(lambda match: masks[match.group()], str(error_msg))
+
+
+_SENSITIVE_ENV_KEYS = ('GEMINI_API_KEY', 'GOOGLE_API_KEY', 'DEEPSEEK_API_KEY',
+                       'OPENAI_API_KEY', 'EMAIL_PASSWORD', 'IMAP_PASSWORD',
+                       'ADMIN_PASSWORD')
+
+
+@lru_cache(maxsize=16)
+def _secret_pattern(sensitive_keys: Tuple[Optional[str], ...]) -> Tuple[Optional[Pattern], Dict[str, str]]:
+    """Compiled single-pass pattern and replacement map for a set of secrets."""
+    # Only mask keys longer than 4 chars
+    secrets = {key for key in sensitive_keys if key and len(key) > 4}
+    if not secrets:
+        return None, {}
+    # Mask the key but keep first 4 and last 4 chars for debugging
+    masks = {key: key[:4] + "***" + key[-4:] if len(key) > 8 else "***" for key in secrets}
+    # Longest first, so a secret containing another one is masked whole
+    alternatives = sorted(secrets, key=len, reverse=True)
+    return re.compile("|".join(map(re.escape, alternatives))), masks